@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import date
+
+# Dates the ledger stores. The day trees start at MIN_DATE, so every write
+# path checks a date with check_date before anything is committed.
+MIN_DATE = date(1900, 1, 1)
+MAX_DATE = date(2199, 12, 31)
+EPOCH = MIN_DATE.toordinal()
+
+
+def check_date(when):
+    # when is a date or datetime; ValueError outside MIN_DATE..MAX_DATE.
+    if not EPOCH <= when.toordinal() <= MAX_DATE.toordinal():
+        raise ValueError(f"The date must be between {MIN_DATE.isoformat()} and {MAX_DATE.isoformat()}")
+    return when
+
+
+class FenwickTree:
+    def __init__(self, size=1024):
+        self.tree = [0] * (size + 1)
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def grow(self, size):
+        values = [self.range_sum(i, i) for i in range(len(self))]
+        self.tree = [0] * (size + 1)
+        for i, value in enumerate(values):
+            if value:
+                self.add(i, value)
+
+    def add(self, index, delta):
+        if index < 0:
+            raise ValueError(f"Index {index} is before the start of the tree")
+        if index >= len(self):
+            self.grow(max(index + 1, len(self) * 2))
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        # Sum of positions 0..index inclusive.
+        total = 0
+        i = min(index, len(self) - 1) + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, start, end):
+        if end < start:
+            return 0
+        return self.prefix_sum(end) - (self.prefix_sum(start - 1) if start > 0 else 0)
+
+
+def day_index(day):
+    return day.toordinal() - EPOCH
+
+
+def transaction_day(transaction):
+    return date.fromisoformat(transaction["datetime"][:10])
+
+
+class TotalsIndex:
+    # Running per-day and per-month totals in centavos. Expenses and income
+    # are also kept in Fenwick trees over day numbers so any date range sums
+    # in O(log n).
+    def __init__(self):
+        self.days = defaultdict(int)
+        self.months = defaultdict(int)
+        self.month_counts = defaultdict(int)
+        # Net amount per (category id, year, month), kept for budgets.
+        self.category_months = defaultdict(int)
+        size = day_index(date.today()) + 366
+        self.expenses = FenwickTree(size)
+        self.income = FenwickTree(size)
+
+    def add(self, transaction, sign=1):
+        day = transaction_day(transaction)
+        amount = transaction["amount"] * sign
+        self.days[day] += amount
+        self.months[(day.year, day.month)] += amount
+        self.month_counts[(day.year, day.month)] += sign
+        if not self.month_counts[(day.year, day.month)]:
+            del self.month_counts[(day.year, day.month)]
+        self.category_months[(transaction["category_id"], day.year, day.month)] += amount
+        if transaction["amount"] < 0:
+            self.expenses.add(day_index(day), -amount)
+        else:
+            self.income.add(day_index(day), amount)
+
+    def remove(self, transaction):
+        self.add(transaction, sign=-1)
+
+    def day_total(self, day):
+        return self.days.get(day, 0)
+
+    def month_total(self, year, month):
+        return self.months.get((year, month), 0)
+
+    def category_month_total(self, category_id, year, month):
+        return self.category_months.get((category_id, year, month), 0)
+
+    def active_months(self):
+        # (year, month) pairs holding at least one transaction, newest first.
+        return sorted(self.month_counts, reverse=True)
+
+    def spent_between(self, start, end):
+        return self.expenses.range_sum(day_index(start), day_index(end))
+
+    def earned_between(self, start, end):
+        return self.income.range_sum(day_index(start), day_index(end))
+
+    def net_between(self, start, end):
+        return self.earned_between(start, end) - self.spent_between(start, end)
+
+    def spent_this_month(self, today=None):
+        today = today or date.today()
+        return self.spent_between(today.replace(day=1), today)
+
+    def spent_this_year(self, today=None):
+        today = today or date.today()
+        return self.spent_between(today.replace(month=1, day=1), today)
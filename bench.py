@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from storage import LedgerStore
+
+CATEGORY_ICON_DIR = "icons/category icons"
+ACCOUNT_TYPES = ("Regular", "Savings", "Credit", "Investment")
+NOTES = ("", "", "lunch", "groceries", "jeepney", "load", "rent", "coffee", "refund", "gift")
+
+
+def generate_ledger(path, accounts=5, categories=20, transactions=10000, days=730, seed=1):
+    # A reproducible ledger: accounts with opening balances, expense and
+    # income categories cycling through the bundled icons, and transactions
+    # spread uniformly over the last `days` days.
+    rng = random.Random(seed)
+    store = LedgerStore(path)
+    try:
+        account_names = []
+        for i in range(accounts):
+            name = f"Account {i + 1}"
+            account_id = store.add_account(ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)], name, rng.randint(0, 5000000))
+            account_names.append((account_id, name))
+
+        icons = sorted(
+            os.path.join(CATEGORY_ICON_DIR, name) for name in os.listdir(CATEGORY_ICON_DIR) if name.endswith(".png")
+        )
+        income_count = max(1, categories // 5)
+        sections = {"expenses": [], "income": []}
+        for i in range(categories):
+            kind = "income" if i < income_count else "expenses"
+            sections[kind].append({"icon": icons[i % len(icons)], "name": f"{kind.title()} {i + 1}"})
+        store.add_categories(sections)
+
+        end = datetime.now().replace(microsecond=0)
+        span = days * 86400
+        batch = []
+        deltas = {}
+        for _ in range(transactions):
+            account_id, account = rng.choice(account_names)
+            if rng.random() < 0.15:
+                category = rng.choice(sections["income"])
+                amount = rng.randint(50000, 3000000)
+            else:
+                category = rng.choice(sections["expenses"])
+                amount = -rng.randint(1000, 500000)
+            when = end - timedelta(seconds=rng.randrange(span))
+            batch.append((account_id, account, category["id"], category["name"], amount,
+                          when.strftime("%Y-%m-%d %H:%M:%S"), rng.choice(NOTES)))
+            deltas[account_id] = deltas.get(account_id, 0) + amount
+            if len(batch) >= 50000:
+                store.add_transactions(batch, deltas)
+                batch, deltas = [], {}
+        if batch:
+            store.add_transactions(batch, deltas)
+    finally:
+        store.close()
+    return path
+
+
+def measure(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+"""HEADLESS"""
+
+
+def bench_ledger(path, repeat):
+    from ledger import Ledger
+
+    results = {}
+    ledgers = []
+
+    def cold_load():
+        ledger = Ledger(LedgerStore(path))
+        ledger.load()
+        ledgers.append(ledger)
+
+    results["ledger_load"] = measure(cold_load, repeat)
+    for ledger in ledgers[:-1]:
+        ledger.store.close()
+    ledger = ledgers[-1]
+
+    # No snapshot exists until one is saved, so ledger_load above is the full scan.
+    ledger.save_snapshot()
+    restored = []
+
+    def snapshot_load():
+        restored.append(Ledger(LedgerStore(path)))
+        restored[-1].load()
+
+    results["snapshot_load"] = measure(snapshot_load, repeat)
+    for other in restored:
+        other.store.close()
+
+    account = ledger.accounts.names()[0]
+    category = ledger.categories.section("expenses")[0]["id"]
+    posted = []
+
+    def post():
+        transaction = ledger.make_transaction(account, category, "12.50", "bench")
+        ledger.post_transaction(transaction)
+        posted.append(transaction)
+
+    results["post_transaction"] = measure(post, repeat * 10)
+    for transaction in posted:
+        ledger.delete_transaction(transaction)
+
+    names = ledger.accounts.names()
+    pick = random.Random(0).choice
+    results["add_to_account"] = measure(
+        lambda: ledger.add_to_account(ledger.accounts.id_for(pick(names)), 100), repeat * 100
+    )
+    newest = ledger.history_months()[0]
+    results["month_groups"] = measure(lambda: ledger.month_groups(*newest), repeat, setup=ledger.months.clear)
+    ledger.store.close()
+    return results
+
+
+"""TK"""
+
+
+def start_virtual_display():
+    # Tk needs an X server; use Xvfb when there is no display to borrow.
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    display = f":{random.randint(100, 999)}"
+    process = subprocess.Popen([xvfb, display, "-screen", "0", "1024x768x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    if process.poll() is not None:
+        return None
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def bench_tk(path, repeat):
+    import tkinter as tk
+
+    from icons import icon_cache
+    from ledger import Ledger
+    from main import BudgetTracker
+
+    results = {}
+    apps = []
+
+    def cold_start():
+        icon_cache.clear()
+        ledger = Ledger(LedgerStore(path))
+        ledger.load()
+        root = tk.Tk()
+        app = BudgetTracker(root, ledger)
+        root.update()
+        apps.append((root, app))
+
+    def close_apps():
+        while apps:
+            root, app = apps.pop()
+            app.workers.shutdown(wait=True)
+            app.ledger.store.close()
+            root.destroy()
+
+    results["cold_start"] = measure(cold_start, repeat, setup=close_apps)
+    root, app = apps[-1]
+    ledger = app.ledger
+
+    account = ledger.accounts.names()[0]
+    category = ledger.categories.section("expenses")[0]["id"]
+    posted = []
+
+    def save_transaction():
+        # The body of the Add button handler, minus the modal.
+        transaction = ledger.make_transaction(account, category, "12.50", "bench")
+        app.update_account_balance(ledger.post_transaction(transaction))
+        app.show_new_transaction(transaction)
+        root.update_idletasks()
+        posted.append(transaction)
+
+    results["save_transaction"] = measure(save_transaction, repeat * 10)
+    for transaction in posted:
+        ledger.delete_transaction(transaction)
+
+    def rebuild():
+        app.create_transactions_tab()
+        root.update_idletasks()
+
+    results["create_transactions_tab"] = measure(rebuild, repeat)
+
+    def toggle():
+        app.toggle_edit_mode()
+        root.update_idletasks()
+
+    results["update_categories_display"] = measure(toggle, repeat * 2)
+
+    close_apps()
+    return results
+
+
+def numpy_version():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy.__version__
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the budget tracker hot paths on synthetic ledgers.")
+    parser.add_argument("--scales", default="1000,10000,100000", help="comma-separated transaction counts")
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--days", type=int, default=730, help="date span of the generated history")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-tk", action="store_true", help="skip the benchmarks that need a display")
+    parser.add_argument("--output", default="-", help="JSON output file, or - for stdout")
+    args = parser.parse_args(argv)
+
+    display = None if args.no_tk else start_virtual_display()
+    tk_available = not args.no_tk and bool(os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy_version(),
+        "accounts": args.accounts,
+        "categories": args.categories,
+        "days": args.days,
+        "scales": {},
+    }
+    try:
+        for scale in (int(value) for value in args.scales.split(",")):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = generate_ledger(os.path.join(tmp, "bench.db"), args.accounts, args.categories, scale,
+                                       args.days, args.seed)
+                results = {"headless": bench_ledger(path, args.repeat)}
+                results["tk"] = bench_tk(path, args.repeat) if tk_available else None
+                report["scales"][str(scale)] = results
+            print(f"{scale:,} transactions done", file=sys.stderr)
+    finally:
+        if display is not None:
+            display.terminate()
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, localcontext
+
+# Keypad arithmetic: + - * / (or x) over decimal numbers, no parentheses and
+# no exponent. The expression and every operand are length-capped, so
+# evaluation is linear in the input and can never blow up the way eval("9**9**9") does.
+MAX_EXPRESSION_LENGTH = 64
+MAX_OPERAND_DIGITS = 12
+MAX_RESULT = Decimal("999999999999.99")
+CENTAVO = Decimal("0.01")
+
+
+class CalculatorError(ValueError):
+    pass
+
+
+def tokenize(expression):
+    expression = expression.replace("₱", "").replace(",", "").replace("x", "*").replace(" ", "")
+    if not expression:
+        raise CalculatorError("Empty expression")
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError("Expression is too long")
+
+    tokens = []
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        if char in "+-*/":
+            tokens.append(char)
+            i += 1
+        elif char.isdigit() or char == ".":
+            start = i
+            while i < len(expression) and (expression[i].isdigit() or expression[i] == "."):
+                i += 1
+            number = expression[start:i]
+            whole, _, fraction = number.partition(".")
+            if number.count(".") > 1 or number == ".":
+                raise CalculatorError(f"Invalid number: {number}")
+            if len(whole.lstrip("0")) > MAX_OPERAND_DIGITS or len(fraction) > MAX_OPERAND_DIGITS:
+                raise CalculatorError(f"Number is too large: {number}")
+            tokens.append(Decimal(number))
+        else:
+            raise CalculatorError(f"Unexpected character: {char}")
+    return tokens
+
+
+class Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expression(self):
+        value = self.term()
+        while self.peek() in ("+", "-"):
+            if self.take() == "+":
+                value += self.term()
+            else:
+                value -= self.term()
+        return value
+
+    def term(self):
+        value = self.factor()
+        while self.peek() in ("*", "/"):
+            if self.take() == "*":
+                value *= self.factor()
+            else:
+                divisor = self.factor()
+                if divisor == 0:
+                    raise CalculatorError("Division by zero")
+                value /= divisor
+        return value
+
+    def factor(self):
+        token = self.take()
+        if token == "-":
+            return -self.factor()
+        if token == "+":
+            return self.factor()
+        if isinstance(token, Decimal):
+            return token
+        raise CalculatorError("Incomplete expression")
+
+
+def evaluate(expression):
+    tokens = tokenize(expression)
+    with localcontext() as ctx:
+        ctx.prec = 40
+        try:
+            parser = Parser(tokens)
+            value = parser.expression()
+            if parser.peek() is not None:
+                raise CalculatorError("Incomplete expression")
+            value = value.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise CalculatorError("Result is out of range")
+    if abs(value) > MAX_RESULT:
+        raise CalculatorError("Result is out of range")
+    return value
+
+
+def evaluate_centavos(expression):
+    return int(evaluate(expression) * 100)
@@ -0,0 +1,366 @@
+import calendar
+from array import array
+from datetime import date, datetime, timedelta
+
+# NumPy is imported by numpy() on the first vectorized call rather than
+# with this module: it costs well over 100 ms, and importing the ledger
+# headless should take milliseconds.
+np = None
+numpy_tried = False
+
+EXACT_FLOAT_LIMIT = 2 ** 53
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def numpy():
+    # The numpy module, or None when it is not installed.
+    global np, numpy_tried
+    if not numpy_tried:
+        numpy_tried = True
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        np = module
+    return np
+
+
+def to_timestamp(value):
+    # Ledger datetimes are naive local times; they are stored as if UTC so the
+    # day and month boundaries come out the same as the text they came from.
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return calendar.timegm(value.timetuple())
+
+
+def parse_timestamp(text):
+    # "YYYY-MM-DD[ HH:MM:SS]" without going through strptime, which dominates bulk loads.
+    if len(text) >= 19:
+        fields = (int(text[:4]), int(text[5:7]), int(text[8:10]),
+                  int(text[11:13]), int(text[14:16]), int(text[17:19]))
+    else:
+        fields = (int(text[:4]), int(text[5:7]), int(text[8:10]), 0, 0, 0)
+    return calendar.timegm(fields)
+
+
+def day_from_key(key):
+    return EPOCH_DATE + timedelta(days=key)
+
+
+def month_from_key(key):
+    year, month = divmod(key, 12)
+    return 1970 + year, month + 1
+
+
+def decode_key(group, key):
+    if group == "day":
+        return day_from_key(key)
+    if group == "month":
+        return month_from_key(key)
+    return key
+
+
+class TransactionColumns:
+    # Parallel typed arrays, one slot per transaction: int64 ids, epoch
+    # seconds and centavo amounts, int32 account, category and note ids.
+    # Filters and group sums run over whole columns at once, through NumPy
+    # when it is installed and plain loops over the arrays otherwise.
+    def __init__(self):
+        self.ids = array("q")
+        self.timestamps = array("q")
+        self.amounts = array("q")
+        self.account_ids = array("i")
+        self.category_ids = array("i")
+        self.note_ids = array("i")
+        # Row positions newest first, built on the first id query. Rows
+        # appended after it are newer still and wait in newest (oldest
+        # first) until the next query puts them in front.
+        self.order = None
+        self.newest = []
+        # Row of each id, built on the first remove and kept up from then on.
+        self.rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def all_columns(self):
+        return self.ids, self.timestamps, self.amounts, self.account_ids, self.category_ids, self.note_ids
+
+    def append(self, transaction_id, timestamp, amount, account_id, category_id, note_id=0):
+        self.ids.append(transaction_id)
+        self.timestamps.append(timestamp)
+        self.amounts.append(amount)
+        self.account_ids.append(account_id or 0)
+        self.category_ids.append(category_id or 0)
+        self.note_ids.append(note_id)
+        if self.rows is not None:
+            self.rows[transaction_id] = len(self.ids) - 1
+        if self.order is not None:
+            # A new transaction is nearly always the newest, and ids only
+            # grow, so it goes to the front; anything else re-sorts later.
+            front = self.newest[-1] if self.newest else (self.order[0] if len(self.order) else None)
+            if front is None or timestamp >= self.timestamps[front]:
+                self.newest.append(len(self.ids) - 1)
+            else:
+                self.order = None
+
+    def remove(self, transaction_id):
+        # Order does not matter to any aggregate, so swap the last row into the hole.
+        if self.rows is None:
+            self.rows = {row_id: index for index, row_id in enumerate(self.ids)}
+        index = self.rows.pop(transaction_id)
+        for column in self.all_columns():
+            last = column.pop()
+            if index < len(column):
+                column[index] = last
+        if index < len(self.ids):
+            self.rows[self.ids[index]] = index
+        self.order = None
+
+    def mark_sorted(self):
+        # The rows were appended oldest first (as on a full load), so the
+        # newest-first order is just the reverse and needs no sort.
+        if numpy() is not None:
+            self.order = np.arange(len(self.ids) - 1, -1, -1)
+            self.newest = []
+
+    def clear(self):
+        for column in self.all_columns():
+            del column[:]
+        self.order = None
+        self.newest = []
+        self.rows = None
+
+    """QUERIES"""
+
+    def total(self, start=None, end=None, kind=None, account_id=None, category_id=None):
+        if numpy() is not None:
+            mask = self.np_mask(start, end, kind, account_id, category_id)
+            amounts = np.frombuffer(self.amounts, dtype=np.int64)
+            return int(amounts[mask].sum()) if mask is not None else int(amounts.sum())
+        return sum(amount for _, amount in self.py_rows(start, end, kind, account_id, category_id, None))
+
+    def sum_by(self, group, start=None, end=None, kind=None, account_id=None, category_id=None):
+        # group is "category", "account", "day" or "month"; the result maps
+        # category/account ids, dates, or (year, month) pairs to centavos.
+        if numpy() is not None:
+            sums = self.np_sum_by((group,), start, end, kind, account_id, category_id)
+        else:
+            sums = {}
+            for key, amount in self.py_rows(start, end, kind, account_id, category_id, (group,)):
+                sums[key] = sums.get(key, 0) + amount
+        return {decode_key(group, key[0]): total for key, total in sums.items()}
+
+    def sum_by_pair(self, first, second, start=None, end=None, kind=None, account_id=None, category_id=None):
+        # Two-way pivot in one pass, e.g. ("month", "category") -> {((2024, 1), 3): total}.
+        return self.sum_by_groups((first, second), start, end, kind, account_id, category_id)
+
+    def sum_by_groups(self, groups, start=None, end=None, kind=None, account_id=None, category_id=None):
+        # Any number of groups at once; keys are tuples in the order of groups.
+        if numpy() is not None:
+            sums = self.np_sum_by(groups, start, end, kind, account_id, category_id)
+        else:
+            sums = {}
+            for key, amount in self.py_rows(start, end, kind, account_id, category_id, groups):
+                sums[key] = sums.get(key, 0) + amount
+        return {tuple(decode_key(group, part) for group, part in zip(groups, key)): total
+                for key, total in sums.items()}
+
+    def top(self, group, n, start=None, end=None, kind="expenses"):
+        sums = self.sum_by(group, start, end, kind)
+        return sorted(sums.items(), key=lambda item: abs(item[1]), reverse=True)[:n]
+
+    def select_ids(self, start=None, end=None, kind=None, account_id=None, category_id=None,
+                   min_amount=None, max_amount=None, note_ids=None):
+        # Ids of the matching rows, newest first. The amount bounds apply to
+        # the absolute amount; note_ids, when given, keeps only rows whose
+        # note id is in that set.
+        if numpy() is not None:
+            return self.np_select_ids(start, end, kind, account_id, category_id, min_amount, max_amount, note_ids)
+        matches = []
+        for transaction_id, timestamp, amount, note_id in self.py_matches(start, end, kind, account_id, category_id):
+            if min_amount is not None and abs(amount) < min_amount:
+                continue
+            if max_amount is not None and abs(amount) > max_amount:
+                continue
+            if note_ids is not None and note_id not in note_ids:
+                continue
+            matches.append((timestamp, transaction_id))
+        matches.sort(reverse=True)
+        return [transaction_id for _, transaction_id in matches]
+
+    """NUMPY"""
+
+    def np_mask(self, start, end, kind, account_id, category_id):
+        mask = None
+
+        def both(condition):
+            return condition if mask is None else mask & condition
+
+        if start is not None or end is not None:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.int64)
+            if start is not None:
+                mask = both(timestamps >= to_timestamp(start))
+            if end is not None:
+                mask = both(timestamps < to_timestamp(end))
+        if kind is not None:
+            amounts = np.frombuffer(self.amounts, dtype=np.int64)
+            mask = both(amounts < 0 if kind == "expenses" else amounts > 0)
+        if account_id is not None:
+            mask = both(np.frombuffer(self.account_ids, dtype=np.int32) == account_id)
+        if category_id is not None:
+            mask = both(np.frombuffer(self.category_ids, dtype=np.int32) == category_id)
+        return mask
+
+    def np_keys(self, group):
+        if group == "category":
+            return np.frombuffer(self.category_ids, dtype=np.int32).astype(np.int64)
+        if group == "account":
+            return np.frombuffer(self.account_ids, dtype=np.int32).astype(np.int64)
+        timestamps = np.frombuffer(self.timestamps, dtype=np.int64)
+        if group == "day":
+            return timestamps // 86400
+        if group == "month":
+            # Map each distinct day to its month once, then gather, instead of
+            # converting every timestamp through datetime64.
+            days = timestamps // 86400
+            low = int(days.min())
+            months = np.arange(low, int(days.max()) + 1).astype("datetime64[D]").astype("datetime64[M]")
+            return months.astype(np.int64)[days - low]
+        raise ValueError(f"Unknown group: {group}")
+
+    def np_order(self):
+        if self.order is None:
+            ids = np.frombuffer(self.ids, dtype=np.int64)
+            timestamps = np.frombuffer(self.timestamps, dtype=np.int64)
+            # Newest first, ties broken by the larger (later) id.
+            self.order = np.lexsort((ids, timestamps))[::-1].copy()
+            self.newest = []
+        elif self.newest:
+            # One copy for the whole run of appends since the last query.
+            self.order = np.concatenate((np.array(self.newest[::-1], dtype=self.order.dtype), self.order))
+            self.newest = []
+        return self.order
+
+    def np_select_ids(self, start, end, kind, account_id, category_id, min_amount, max_amount, note_ids):
+        if not len(self):
+            return []
+        mask = self.np_mask(start, end, kind, account_id, category_id)
+
+        def both(condition):
+            return condition if mask is None else mask & condition
+
+        if min_amount is not None or max_amount is not None:
+            amounts = np.abs(np.frombuffer(self.amounts, dtype=np.int64))
+            if min_amount is not None:
+                mask = both(amounts >= min_amount)
+            if max_amount is not None:
+                mask = both(amounts <= max_amount)
+        if note_ids is not None:
+            wanted = np.fromiter(note_ids, dtype=np.int32, count=len(note_ids))
+            mask = both(np.isin(np.frombuffer(self.note_ids, dtype=np.int32), wanted))
+
+        order = self.np_order()
+        if mask is not None:
+            order = order[mask[order]]
+        return np.frombuffer(self.ids, dtype=np.int64)[order]
+
+    def np_sum_by(self, groups, start, end, kind, account_id, category_id):
+        # Returns {(key, ...): total} with one raw key per group.
+        if not len(self):
+            return {}
+        mask = self.np_mask(start, end, kind, account_id, category_id)
+        amounts = np.frombuffer(self.amounts, dtype=np.int64)
+        columns = [self.np_keys(group) for group in groups]
+        if mask is not None:
+            amounts = amounts[mask]
+            columns = [keys[mask] for keys in columns]
+        if not len(amounts):
+            return {}
+
+        # Fold the key columns into one dense non-negative code per row.
+        lows = [int(keys.min()) for keys in columns]
+        spans = [int(keys.max()) - low + 1 for keys, low in zip(columns, lows)]
+        codes = columns[0] - lows[0]
+        for keys, low, span in zip(columns[1:], lows[1:], spans[1:]):
+            codes = codes * span + (keys - low)
+
+        if int(np.abs(amounts).sum()) < EXACT_FLOAT_LIMIT and int(codes.max()) < 10 * len(codes) + 1024:
+            # bincount sums in float64, which is exact while every partial sum stays below 2**53.
+            sums = np.bincount(codes, weights=amounts)
+            present = np.flatnonzero(np.bincount(codes) > 0)
+            totals = [int(round(sums[code])) for code in present]
+        else:
+            order = np.argsort(codes, kind="stable")
+            sorted_codes = codes[order]
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+            present = sorted_codes[starts]
+            totals = [int(total) for total in np.add.reduceat(amounts[order], starts)]
+
+        result = {}
+        for code, total in zip(present.tolist(), totals):
+            key = []
+            for low, span in zip(reversed(lows), reversed(spans)):
+                code, part = divmod(code, span)
+                key.append(part + low)
+            result[tuple(reversed(key))] = total
+        return result
+
+    """PURE PYTHON"""
+
+    def py_matches(self, start, end, kind, account_id, category_id):
+        start = to_timestamp(start) if start is not None else None
+        end = to_timestamp(end) if end is not None else None
+        for transaction_id, timestamp, amount, account, category, note_id in zip(*self.all_columns()):
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                continue
+            if kind is not None and (amount >= 0 if kind == "expenses" else amount <= 0):
+                continue
+            if account_id is not None and account != account_id:
+                continue
+            if category_id is not None and category != category_id:
+                continue
+            yield transaction_id, timestamp, amount, note_id
+
+    def py_rows(self, start, end, kind, account_id, category_id, groups):
+        start = to_timestamp(start) if start is not None else None
+        end = to_timestamp(end) if end is not None else None
+        months = {}
+
+        def raw_key(group, timestamp, account, category):
+            if group == "category":
+                return category
+            if group == "account":
+                return account
+            if group == "day":
+                return timestamp // 86400
+            if group == "month":
+                day = timestamp // 86400
+                key = months.get(day)
+                if key is None:
+                    d = day_from_key(day)
+                    key = months[day] = (d.year - 1970) * 12 + d.month - 1
+                return key
+            raise ValueError(f"Unknown group: {group}")
+
+        for timestamp, amount, account, category in zip(self.timestamps, self.amounts,
+                                                        self.account_ids, self.category_ids):
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                continue
+            if kind is not None and (amount >= 0 if kind == "expenses" else amount <= 0):
+                continue
+            if account_id is not None and account != account_id:
+                continue
+            if category_id is not None and category != category_id:
+                continue
+
+            if groups is None:
+                yield None, amount
+            else:
+                yield tuple(raw_key(group, timestamp, account, category) for group in groups), amount
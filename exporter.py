@@ -0,0 +1,102 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+
+from money import BASE_CURRENCY, format_plain
+from storage import DB_PATH, LedgerStore
+
+TRANSACTION_FIELDS = ("id", "datetime", "account", "category", "amount", "currency", "notes")
+BALANCE_FIELDS = ("id", "type", "name", "balance", "currency")
+
+
+def transaction_records(store, start=None, end=None, account=None, category=None):
+    # Amounts are in their account's currency; rows of deleted accounts are in pesos.
+    currencies = {row["id"]: row["currency"] for row in store.load_accounts()}
+    for row in store.iter_transactions(start=start, end=end, account=account, category=category):
+        yield {
+            "id": row["id"],
+            "datetime": row["datetime"],
+            "account": row["account"],
+            "category": row["category"],
+            "amount": format_plain(row["amount"]),
+            "currency": currencies.get(row["account_id"], BASE_CURRENCY),
+            "notes": row["notes"],
+        }
+
+
+def balance_records(store):
+    for row in store.load_accounts():
+        yield {"id": row["id"], "type": row["type"], "name": row["name"], "balance": format_plain(row["balance"]),
+               "currency": row["currency"]}
+
+
+def write_csv(records, out, fields):
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def write_jsonl(records, out):
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def export(store, out, fmt="csv", balances=False, **filters):
+    if balances:
+        records, fields = balance_records(store), BALANCE_FIELDS
+    else:
+        records, fields = transaction_records(store, **filters), TRANSACTION_FIELDS
+    if fmt == "jsonl":
+        return write_jsonl(records, out)
+    return write_csv(records, out, fields)
+
+
+def iso_date(text):
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {text!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the budget ledger as CSV or JSON Lines.")
+    parser.add_argument("output", nargs="?", default="-", help="output file, or - for stdout")
+    parser.add_argument("--db", default=DB_PATH, help="ledger database (default: %(default)s)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None,
+                        help="output format (default: from the output file extension, else csv)")
+    parser.add_argument("--from", dest="start", type=iso_date, help="first date to include, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=iso_date, help="last date to include, YYYY-MM-DD")
+    parser.add_argument("--account", help="only transactions from this account")
+    parser.add_argument("--category", help="only transactions in this category")
+    parser.add_argument("--balances", action="store_true", help="export account balances instead of transactions")
+    args = parser.parse_args(argv)
+    if args.start and args.end and args.start > args.end:
+        parser.error("--from is after --to")
+
+    fmt = args.format or ("jsonl" if args.output.endswith((".jsonl", ".json")) else "csv")
+    store = LedgerStore(args.db)
+    try:
+        if args.output == "-":
+            count = export(store, sys.stdout, fmt, args.balances, start=args.start, end=args.end,
+                           account=args.account, category=args.category)
+        else:
+            with open(args.output, "w", newline="", encoding="utf-8") as out:
+                count = export(store, out, fmt, args.balances, start=args.start, end=args.end,
+                               account=args.account, category=args.category)
+    finally:
+        store.close()
+    print(f"Exported {count} records", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import csv
+import os
+from bisect import bisect_right
+from datetime import date
+
+from columns import numpy
+from money import BASE_CURRENCY
+
+FX_RATES_FILE = "fx_rates.csv"
+
+
+def rates_path(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), FX_RATES_FILE)
+
+
+class FxRates:
+    # Exchange rates from a local CSV file with date,currency,rate rows, where
+    # rate is what one unit of the currency is worth in the base currency on
+    # that date. A lookup takes the latest rate on or before the day asked
+    # for (the earliest one for days before it). The file is re-read only when
+    # its modification time changes and lookups are cached per (currency,
+    # day); nothing here touches the network.
+    def __init__(self, path, base=BASE_CURRENCY):
+        self.path = path
+        self.base = base
+        self.mtime = None
+        self.days = {}
+        self.rates = {}
+        self.cache = {}
+
+    def refresh(self):
+        # True when the table changed, so callers drop converted results.
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        self.load()
+        return True
+
+    def load(self):
+        table = {}
+        if self.mtime is not None:
+            with open(self.path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        day = date.fromisoformat((row.get("date") or "").strip()[:10]).toordinal()
+                        rate = float(row["rate"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    currency = (row.get("currency") or "").strip().upper()
+                    if currency and rate > 0:
+                        table.setdefault(currency, {})[day] = rate
+        self.days = {currency: sorted(rates) for currency, rates in table.items()}
+        self.rates = {currency: [table[currency][day] for day in self.days[currency]] for currency in table}
+        self.cache.clear()
+
+    def currencies(self):
+        return {self.base} | set(self.days)
+
+    def rate(self, currency, day=None):
+        # Base-currency value of one unit of currency on day, or None without a rate.
+        if currency == self.base:
+            return 1.0
+        day = day or date.today()
+        key = (currency, day)
+        if key in self.cache:
+            return self.cache[key]
+        days = self.days.get(currency)
+        rate = None
+        if days:
+            rate = self.rates[currency][max(bisect_right(days, day.toordinal()) - 1, 0)]
+        self.cache[key] = rate
+        return rate
+
+    def convert(self, currency, amounts, days=None):
+        # One batch of amounts in a single currency to base centavos, each at
+        # the rate of its day in days (or all at today's rate). Returns None
+        # when there is no rate for the currency.
+        amounts = list(amounts)
+        if currency == self.base:
+            return amounts
+        if days is None:
+            rate = self.rate(currency)
+            if rate is None:
+                return None
+            rates = [rate] * len(amounts)
+        else:
+            rates = [self.rate(currency, day) for day in days]
+            if None in rates:
+                return None
+        np = numpy()
+        if np is not None:
+            return np.rint(np.asarray(amounts, dtype=np.float64) * np.asarray(rates)).astype(np.int64).tolist()
+        return [round(amount * rate) for amount, rate in zip(amounts, rates)]
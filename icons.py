@@ -0,0 +1,205 @@
+import json
+import os
+from collections import OrderedDict
+
+from tracing import timer
+
+PLACEHOLDER = "icons/placeholder.png"
+CATEGORY_ICON_DIR = "icons/category icons"
+ICON_DIRS = ("icons", CATEGORY_ICON_DIR)
+ATLAS_IMAGE = "icons/atlas.png"
+ATLAS_MANIFEST = "icons/atlas.json"
+# Category grid, icon picker, transaction rows, account-type buttons.
+ATLAS_SIZES = (70, 50, 30, 20)
+
+
+def icon_key(path):
+    return path.replace("\\", "/")
+
+
+def list_icons(folder=CATEGORY_ICON_DIR):
+    return sorted(f"{folder}/{name}" for name in os.listdir(folder) if name.endswith(".png"))
+
+
+def decode_icon(path, size):
+    # PIL is only needed once the GUI draws icons, so it stays out of the import path.
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.convert("RGBA").resize(size, Image.LANCZOS)
+
+
+def make_photo(img):
+    from PIL import ImageTk
+    return ImageTk.PhotoImage(img)
+
+
+def build_atlas(image_path=ATLAS_IMAGE, manifest_path=ATLAS_MANIFEST):
+    # Every icon gets one row in the atlas holding its pre-resized copies
+    # side by side, largest first.
+    from PIL import Image
+    paths = []
+    for folder in ICON_DIRS:
+        for name in sorted(os.listdir(folder)):
+            path = f"{folder}/{name}"
+            if name.endswith(".png") and path != image_path:
+                paths.append(path)
+
+    row_height = max(ATLAS_SIZES)
+    atlas = Image.new("RGBA", (sum(ATLAS_SIZES), row_height * len(paths)), (0, 0, 0, 0))
+    entries = {}
+    for i, path in enumerate(paths):
+        x, y = 0, i * row_height
+        entries[path] = {}
+        for size in ATLAS_SIZES:
+            atlas.paste(decode_icon(path, (size, size)), (x, y))
+            entries[path][str(size)] = [x, y]
+            x += size
+
+    atlas.save(image_path, optimize=True)
+    with open(manifest_path, "w") as f:
+        json.dump({"version": 1, "image": image_path, "sizes": list(ATLAS_SIZES), "icons": entries}, f)
+    return len(paths)
+
+
+class IconAtlas:
+    def __init__(self, image_path, icons):
+        self.image_path = image_path
+        self.icons = icons
+        self.image = None
+
+    @classmethod
+    def load(cls, manifest_path=ATLAS_MANIFEST):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != 1 or not os.path.exists(manifest["image"]):
+            return None
+        return cls(manifest["image"], manifest["icons"])
+
+    def get(self, path, size):
+        width, height = size
+        if width != height:
+            return None
+        origin = self.icons.get(icon_key(path), {}).get(str(width))
+        if origin is None:
+            return None
+
+        import tkinter as tk
+        if self.image is None:
+            # Tk reads PNG natively, so slicing the atlas needs no PIL at all.
+            self.image = tk.PhotoImage(file=self.image_path)
+        x, y = origin
+        photo = tk.PhotoImage(width=width, height=height)
+        photo.tk.call(photo, "copy", self.image, "-from", x, y, x + width, y + height, "-to", 0, 0)
+        return photo
+
+
+class IconCache:
+    # One decoded PhotoImage per (path, size), shared by every screen. The
+    # least recently used entries are dropped once the decoded pixels exceed
+    # max_bytes.
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.missing = set()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.atlas = None
+        self.atlas_loaded = False
+
+    def get(self, path, size, fallback=PLACEHOLDER):
+        key = (path, tuple(size))
+        photo = self.lookup(key)
+        if photo is not None:
+            return photo
+
+        if key not in self.missing:
+            try:
+                with timer("icon.decode"):
+                    photo = make_photo(decode_icon(path, key[1]))
+            except OSError:
+                self.missing.add(key)
+            else:
+                self.put(key, photo)
+                return photo
+
+        if fallback is None or fallback == path:
+            return None
+        return self.get(fallback, size, fallback=None)
+
+    def request(self, path, size, on_ready, jobs, fallback=PLACEHOLDER):
+        # Like get(), but an icon that would need decoding is decoded on a
+        # worker from `jobs`; the fallback is returned straight away and
+        # on_ready(photo) runs on the Tk thread once the real icon is in.
+        key = (path, tuple(size))
+        photo = self.lookup(key)
+        if photo is not None:
+            return photo
+
+        if key not in self.missing:
+            jobs.submit(decode_icon, path, key[1],
+                        callback=lambda img: on_ready(self.decoded(key, img)),
+                        on_error=lambda error: self.missing.add(key))
+        if fallback is None or fallback == path:
+            return None
+        return self.get(fallback, size, fallback=None)
+
+    def lookup(self, key):
+        # Cached entries and atlas slices; both are cheap on the Tk thread.
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        if not self.atlas_loaded:
+            self.atlas = IconAtlas.load()
+            self.atlas_loaded = True
+        photo = self.atlas.get(key[0], key[1]) if self.atlas is not None else None
+        if photo is not None:
+            self.put(key, photo)
+        return photo
+
+    def decoded(self, key, img):
+        # Two requests may have decoded the same icon; keep the first.
+        if key not in self.entries:
+            self.put(key, make_photo(img))
+        return self.entries[key]
+
+    def put(self, key, photo):
+        self.entries[key] = photo
+        self.size_bytes += entry_bytes(key)
+        while self.size_bytes > self.max_bytes and len(self.entries) > 1:
+            old_key, _ = self.entries.popitem(last=False)
+            self.size_bytes -= entry_bytes(old_key)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.missing.clear()
+        self.size_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.size_bytes
+        }
+
+
+def entry_bytes(key):
+    width, height = key[1]
+    return width * height * 4
+
+
+icon_cache = IconCache()
+
+
+if __name__ == "__main__":
+    print(f"Packed {build_atlas()} icons into {ATLAS_IMAGE}")
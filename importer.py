@@ -0,0 +1,246 @@
+import csv
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from aggregates import check_date
+from money import parse_money
+from storage import LedgerStore
+
+BATCH_SIZE = 50000
+# A bigger page cache for the import connection keeps the two transaction
+# indexes in memory between batch commits.
+IMPORT_CACHE_KIB = 65536
+
+CSV_COLUMNS = {
+    "datetime": ("datetime", "date", "posted", "transaction date", "posting date"),
+    "amount": ("amount", "value"),
+    "debit": ("debit", "withdrawal", "withdrawals"),
+    "credit": ("credit", "deposit", "deposits"),
+    "notes": ("notes", "description", "memo", "payee", "details", "name"),
+    "account": ("account", "account name"),
+    "category": ("category",),
+}
+
+DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y/%m/%d", "%m/%d/%Y", "%m/%d/%Y %H:%M", "%d/%m/%Y", "%b %d, %Y")
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+# The category text of rows whose category matches none of the ledger's;
+# they are stored without a category id rather than guessed into one.
+UNCATEGORIZED = "Uncategorized"
+
+
+def parse_date(text):
+    # "YYYY-MM-DD HH:MM:SS", or ValueError for a date that does not parse or
+    # that the ledger would not store.
+    text = read_date(text)
+    check_date(date.fromisoformat(text[:10]))
+    return text
+
+
+def read_date(text):
+    text = text.strip()
+    # ISO dates are by far the most common, so skip strptime for them.
+    if len(text) == 19 and text[4] == "-" and text[10] in " T":
+        return text[:10] + " " + text[11:]
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        return text + " 00:00:00"
+    if len(text) >= 8 and text[:8].isdigit():
+        # OFX style: YYYYMMDD[HHMMSS][.XXX][TZ]
+        digits = text[:14] if text[8:14].isdigit() else text[:8] + "000000"
+        return f"{digits[:4]}-{digits[4:6]}-{digits[6:8]} {digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised date: {text!r}")
+
+
+class ProgressFile:
+    # Counts characters as lines are read so progress can be reported
+    # against the file size without a first pass to count rows.
+    def __init__(self, f):
+        self.f = f
+        self.position = 0
+
+    def __iter__(self):
+        for line in self.f:
+            self.position += len(line)
+            yield line
+
+    def read(self, size=-1):
+        chunk = self.f.read(size)
+        self.position += len(chunk)
+        return chunk
+
+
+def read_csv(f):
+    reader = csv.reader(f)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if "datetime" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+        raise ValueError("CSV needs a date column and an amount (or debit/credit) column")
+
+    def cell(row, field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for row in reader:
+        if not row:
+            continue
+        # Bank exports often carry summary or footer lines; anything that is
+        # not a transaction comes out as None for the caller to count.
+        try:
+            if "amount" in columns:
+                amount = parse_money(cell(row, "amount"))
+            else:
+                debit = cell(row, "debit")
+                credit = cell(row, "credit")
+                amount = (parse_money(credit) if credit else 0) - (parse_money(debit) if debit else 0)
+            transaction_time = parse_date(cell(row, "datetime"))
+        except ValueError:
+            yield None
+            continue
+        yield {
+            "datetime": transaction_time,
+            "amount": amount,
+            "notes": cell(row, "notes"),
+            "account": cell(row, "account"),
+            "category": cell(row, "category"),
+        }
+
+
+def read_ofx(f, chunk_size=65536):
+    transaction = None
+    buffer = ""
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+        # Hold back the last (possibly partial) tag until the next chunk arrives.
+        cut = len(buffer) if not chunk else max(buffer.rfind("<"), 0)
+        for closing, tag, value in OFX_TAG.findall(buffer[:cut]):
+            tag = tag.upper()
+            value = value.strip()
+            if tag == "STMTTRN":
+                if closing and transaction is not None:
+                    try:
+                        row = {
+                            "datetime": parse_date(transaction.get("DTPOSTED", "")),
+                            "amount": parse_money(transaction.get("TRNAMT", "")),
+                            "notes": " ".join(filter(None, (transaction.get("NAME"), transaction.get("MEMO")))),
+                            "account": "",
+                            "category": "",
+                        }
+                    except ValueError:
+                        row = None
+                    yield row
+                    transaction = None
+                elif not closing:
+                    transaction = {}
+            elif transaction is not None and not closing and value:
+                transaction[tag] = value
+        buffer = buffer[cut:]
+        if not chunk:
+            break
+
+
+def read_statement(f, path):
+    if os.path.splitext(path)[1].lower() in (".ofx", ".qfx"):
+        return read_ofx(f)
+    return read_csv(f)
+
+
+def import_statement(store, path, account_ids, categories, default_account, batch_size=BATCH_SIZE,
+                     progress=None, cancelled=None):
+    # account_ids maps account name to id and categories maps category name
+    # to (id, "expenses" or "income"). Rows naming an unknown account go to
+    # default_account; rows with an unknown or missing category are stored
+    # as UNCATEGORIZED. Returns (imported, skipped, uncategorized) counts,
+    # skipped being rows with no usable date or amount.
+    size = os.path.getsize(path) or 1
+    imported = skipped = uncategorized = 0
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        source = ProgressFile(f)
+        batch = []
+        deltas = {}
+        for row in read_statement(source, path):
+            if row is None:
+                skipped += 1
+                continue
+            account = row["account"] if row["account"] in account_ids else default_account
+            category = row["category"]
+            if category in categories:
+                category_id = categories[category][0]
+            else:
+                category, category_id = UNCATEGORIZED, None
+                uncategorized += 1
+            account_id = account_ids[account]
+            batch.append((account_id, account, category_id, category, row["amount"], row["datetime"], row["notes"]))
+            deltas[account_id] = deltas.get(account_id, 0) + row["amount"]
+
+            if len(batch) >= batch_size:
+                store.add_transactions(batch, deltas)
+                imported += len(batch)
+                batch, deltas = [], {}
+                if progress:
+                    progress(imported, min(1.0, source.position / size))
+                if cancelled is not None and cancelled.is_set():
+                    return imported, skipped, uncategorized
+
+        if batch:
+            store.add_transactions(batch, deltas)
+            imported += len(batch)
+        if progress:
+            progress(imported, 1.0)
+    return imported, skipped, uncategorized
+
+
+class ImportJob(threading.Thread):
+    # Runs import_statement on its own SQLite connection. The Tk thread
+    # polls self.events with root.after; the worker never touches widgets.
+    def __init__(self, db_path, path, account_ids, categories, default_account, batch_size=BATCH_SIZE):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.path = path
+        self.account_ids = dict(account_ids)
+        self.categories = dict(categories)
+        self.default_account = default_account
+        self.batch_size = batch_size
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        # Always ends with a "done", "cancelled" or "error" event, or the Tk
+        # side would poll forever. The first two carry import_statement's counts;
+        # rows committed before a cancel stay in the ledger.
+        store = None
+        try:
+            store = LedgerStore(self.db_path)
+            store.conn.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KIB}")
+            counts = import_statement(
+                store, self.path, self.account_ids, self.categories, self.default_account,
+                batch_size=self.batch_size,
+                progress=lambda count, fraction: self.events.put(("progress", count, fraction)),
+                cancelled=self.cancelled
+            )
+            self.events.put(("cancelled" if self.cancelled.is_set() else "done", counts, 1.0))
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            self.events.put(("error", str(e), 0.0))
+        except Exception as e:
+            self.events.put(("error", f"Unexpected error: {e!r}", 0.0))
+        finally:
+            if store is not None:
+                store.close()
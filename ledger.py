@@ -0,0 +1,690 @@
+import calendar
+import os
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from aggregates import TotalsIndex, check_date
+from calc import MAX_RESULT, CalculatorError, evaluate_centavos
+from columns import EPOCH_DATE, TransactionColumns, parse_timestamp
+from fx import FxRates, rates_path
+from money import BASE_CURRENCY
+from recurring import RecurringScheduler, format_time, next_occurrence, parse_time
+from reports import ReportEngine
+from search import SearchIndex
+from snapshot import SnapshotError, restore_ledger, save_ledger, snapshot_path
+from tracing import traced
+
+DEFAULT_CATEGORIES = {
+    "expenses": [
+        {"icon": "icons/category icons/food.png", "name": "Food"},
+        {"icon": "icons/category icons/transport.png", "name": "Transport"},
+        {"icon": "icons/category icons/shopping.png", "name": "Shopping"},
+        {"icon": "icons/category icons/entertainment.png", "name": "Entertainment"},
+        {"icon": "icons/category icons/health.png", "name": "Health"},
+        {"icon": "icons/category icons/education.png", "name": "Education"},
+        {"icon": "icons/category icons/bills.png", "name": "Bills"},
+        {"icon": "icons/category icons/savings.png", "name": "Savings"},
+    ],
+    "income": [
+        {"icon": "icons/category icons/salary (1).png", "name": "Salary"},
+        {"icon": "icons/category icons/allowance.png", "name": "Allowance"}
+    ]
+}
+
+DEFAULT_ACCOUNT = ("Regular", "Cash", 16569)
+PLACEHOLDER_ICON = "icons/placeholder.png"
+# The largest single amount, as for the keypad.
+MAX_CENTAVOS = int(MAX_RESULT * 100)
+# Months of transactions held in memory; older ones are re-read from the store.
+MONTH_CACHE_SIZE = 12
+
+
+def transaction_time(transaction):
+    return transaction["datetime"]
+
+
+def month_key(transaction):
+    return int(transaction["datetime"][:4]), int(transaction["datetime"][5:7])
+
+
+def remove_sorted(transactions, transaction):
+    # Matched by id: the caller's dict may be a different copy of the row.
+    i = bisect_left(transactions, transaction_time(transaction), key=transaction_time)
+    while i < len(transactions) and transactions[i]["id"] != transaction["id"]:
+        i += 1
+    if i < len(transactions):
+        del transactions[i]
+
+
+class AccountRegistry:
+    # Accounts keyed by their database id, with a name index for the labels
+    # the UI hands back. The GUI stores its Treeview item handle on each
+    # account as "item", so a balance change is one dict lookup and one cell update.
+    def __init__(self):
+        self.by_id = {}
+        self.ids_by_name = {}
+
+    def add(self, account):
+        account.setdefault("item", None)
+        self.by_id[account["id"]] = account
+        self.ids_by_name[account["name"]] = account["id"]
+        return account
+
+    def remove(self, account_id):
+        account = self.by_id.pop(account_id, None)
+        if account is not None and self.ids_by_name.get(account["name"]) == account_id:
+            del self.ids_by_name[account["name"]]
+        return account
+
+    def get(self, account_id):
+        return self.by_id[account_id]
+
+    def id_for(self, name):
+        return self.ids_by_name.get(name)
+
+    def find(self, name):
+        account_id = self.ids_by_name.get(name)
+        return self.by_id[account_id] if account_id is not None else None
+
+    def names(self):
+        return [account["name"] for account in self.by_id.values()]
+
+    def values(self):
+        return self.by_id.values()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, account_id):
+        return account_id in self.by_id
+
+
+class CategoryRegistry:
+    # Categories keyed by their database id, each with its kind ("expenses"
+    # or "income"). Deleted categories are archived, not dropped: they stay
+    # in by_id so old transactions keep their name, kind and icon, but leave
+    # the per-kind sections the Categories tab lists and the name index.
+    def __init__(self):
+        self.by_id = {}
+        self.ids_by_name = {}
+        self.sections = {"expenses": [], "income": []}
+
+    def add(self, category):
+        category.setdefault("archived", False)
+        category.setdefault("budget", None)
+        self.by_id[category["id"]] = category
+        if not category["archived"]:
+            self.sections.setdefault(category["kind"], []).append(category)
+            self.ids_by_name[category["name"]] = category["id"]
+        return category
+
+    def archive(self, category_id):
+        category = self.by_id[category_id]
+        if category["archived"]:
+            return category
+        category["archived"] = True
+        self.sections[category["kind"]].remove(category)
+        if self.ids_by_name.get(category["name"]) == category_id:
+            del self.ids_by_name[category["name"]]
+        return category
+
+    def get(self, category_id):
+        return self.by_id[category_id]
+
+    def id_for(self, name):
+        return self.ids_by_name.get(name)
+
+    def find(self, name):
+        category_id = self.ids_by_name.get(name)
+        return self.by_id[category_id] if category_id is not None else None
+
+    def section(self, kind):
+        return self.sections.get(kind, [])
+
+    def names(self):
+        return list(self.ids_by_name)
+
+    def name_table(self):
+        # Live category name -> (id, kind), for code that only has names.
+        return {name: (category_id, self.by_id[category_id]["kind"]) for name, category_id in self.ids_by_name.items()}
+
+    def icon(self, category_id, default=PLACEHOLDER_ICON):
+        category = self.by_id.get(category_id)
+        return category["icon"] if category is not None else default
+
+    def values(self):
+        return self.by_id.values()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, category_id):
+        return category_id in self.by_id
+
+
+class Ledger:
+    def __init__(self, store):
+        self.store = store
+        self.accounts = AccountRegistry()
+        self.categories = CategoryRegistry()
+        self.months = OrderedDict()
+        self.totals = TotalsIndex()
+        self.columns = TransactionColumns()
+        self.reports = ReportEngine(self.columns)
+        self.search = SearchIndex(self.columns)
+        self.recurring = RecurringScheduler()
+        self.fx = FxRates(rates_path(store.path))
+        # The store's ledger_version() the in-memory indexes were built from,
+        # or None once another connection has written behind them.
+        self.indexed_version = None
+
+    def load(self):
+        self.load_recurring()
+        self.fx.refresh()
+        # A snapshot left by the last clean shutdown skips the full scan of
+        # the transactions table; a missing or stale one falls through to it.
+        if not self.store.is_new and self.restore_snapshot():
+            return
+        if self.store.is_new:
+            self.store.add_account(*DEFAULT_ACCOUNT)
+            self.store.add_categories({kind: [dict(cat) for cat in section]
+                                       for kind, section in DEFAULT_CATEGORIES.items()})
+            self.store.is_new = False
+        version = self.store.ledger_version()
+        self.categories = CategoryRegistry()
+        for row in self.store.load_categories():
+            self.categories.add({"id": row["id"], "kind": row["kind"], "name": row["name"], "icon": row["icon"],
+                                 "archived": bool(row["archived"]), "budget": row["budget"]})
+
+        self.accounts = AccountRegistry()
+        for row in self.store.load_accounts():
+            self.accounts.add({"id": row["id"], "type": row["type"], "name": row["name"], "balance": row["balance"],
+                               "currency": row["currency"]})
+
+        self.load_transactions()
+        if self.indexed_version != version:
+            self.indexed_version = None
+
+    def restore_snapshot(self):
+        version = self.store.ledger_version()
+        state = restore_ledger(snapshot_path(self.store.path), version)
+        if state is None:
+            return False
+        self.indexed_version = version
+        meta, self.totals, self.columns, self.search = state
+        self.categories = CategoryRegistry()
+        for category in meta["categories"]:
+            self.categories.add(category)
+        self.accounts = AccountRegistry()
+        for account_id, account_type, name, balance, currency in meta["accounts"]:
+            self.accounts.add({"id": account_id, "type": account_type, "name": name, "balance": balance,
+                               "currency": currency})
+        # The totals were converted with the rate file as it was at save time.
+        if self.multi_currency() and meta["fx_mtime"] != self.fx.mtime:
+            self.rebuild_totals()
+        self.months = OrderedDict()
+        self.reports = ReportEngine(self.columns, self.report_converter())
+        return True
+
+    def save_snapshot(self):
+        # Only indexes that still match the database are saved. Otherwise the
+        # old snapshot goes too, and the next start rebuilds from the store.
+        path = snapshot_path(self.store.path)
+        try:
+            if self.indexed_version != self.store.ledger_version():
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            save_ledger(self, path, self.indexed_version)
+        except (OSError, SnapshotError):
+            pass
+
+    def track_write(self):
+        # Called after each of the ledger's own writes. Every store write
+        # bumps the version by one, so anything more means another connection
+        # (an import, say) wrote too and the indexes no longer match.
+        version = self.store.ledger_version()
+        if self.indexed_version is not None and version[0] == self.indexed_version[0] + 1:
+            self.indexed_version = version
+        else:
+            self.indexed_version = None
+
+    def refresh_balances(self):
+        # Re-read balances written by another connection (e.g. an import)
+        # without replacing the account dicts the UI holds on to.
+        for row in self.store.load_accounts():
+            if row["id"] in self.accounts:
+                self.accounts.get(row["id"])["balance"] = row["balance"]
+
+    @traced("ledger.load_transactions")
+    def load_transactions(self):
+        # Every row feeds the totals and indexes, but the rows themselves are
+        # not kept: transactions are read back a month at a time.
+        version = self.store.ledger_version()
+        self.months = OrderedDict()
+        self.totals = TotalsIndex()
+        self.columns = TransactionColumns()
+        self.reports = ReportEngine(self.columns, self.report_converter())
+        self.search = SearchIndex(self.columns)
+        for row in self.store.load_transactions():
+            self.index_row(row, row["account_id"])
+        self.columns.mark_sorted()
+        self.indexed_version = version
+
+    def transaction_from_row(self, row):
+        account_id = row["account_id"]
+        return {
+            "id": row["id"],
+            "account": row["account"],
+            "account_id": account_id,
+            "currency": self.account_currency(account_id),
+            "amount": row["amount"],
+            "datetime": row["datetime"],
+            "notes": row["notes"],
+            "category": row["category"],
+            "category_id": row["category_id"]
+        }
+
+    """ACCOUNTS"""
+
+    def add_account(self, account_type, name, balance, currency=BASE_CURRENCY):
+        # Names are what the UI and importer hand back, so they stay unique.
+        if self.accounts.find(name) is not None:
+            raise ValueError(f"An account named {name!r} already exists")
+        account_id = self.store.add_account(account_type, name, balance, currency)
+        self.track_write()
+        account = self.accounts.add({"id": account_id, "type": account_type, "name": name, "balance": balance,
+                                     "currency": currency})
+        self.reports.set_converter(self.report_converter())
+        return account
+
+    def delete_account(self, account_id):
+        self.store.delete_account(account_id)
+        self.track_write()
+        currency = self.account_currency(account_id)
+        self.accounts.remove(account_id)
+        self.reports.set_converter(self.report_converter())
+        # Its rows now count as base currency, so they are converted back out.
+        if currency != BASE_CURRENCY:
+            self.rebuild_totals()
+
+    def add_to_account(self, account_id, amount):
+        account = self.accounts.get(account_id)
+        account["balance"] += amount
+        return account
+
+    def subtract_from_account(self, account_id, amount):
+        return self.add_to_account(account_id, -amount)
+
+    """CURRENCIES"""
+
+    def account_currency(self, account_id):
+        account = self.accounts.by_id.get(account_id)
+        return account["currency"] if account is not None else BASE_CURRENCY
+
+    def multi_currency(self):
+        return any(account["currency"] != BASE_CURRENCY for account in self.accounts.values())
+
+    def report_converter(self):
+        return self.convert_month_sums if self.multi_currency() else None
+
+    def refresh_rates(self):
+        # Picks up an edited rate file; cells and totals converted at the old
+        # rates go. True when anything was converted again.
+        if not self.fx.refresh():
+            return False
+        self.reports.clear()
+        if self.multi_currency():
+            self.rebuild_totals()
+        return True
+
+    def base_row(self, row, currency):
+        # The totals index is kept in the base currency: other currencies go
+        # in at the rate of the month's last day, like the report cells, and
+        # count as 0 while there is no rate.
+        if currency == BASE_CURRENCY:
+            return row
+        year, month = int(row["datetime"][:4]), int(row["datetime"][5:7])
+        rate = self.fx.rate(currency, date(year, month, calendar.monthrange(year, month)[1]))
+        return {"datetime": row["datetime"], "category_id": row["category_id"],
+                "amount": round(row["amount"] * rate) if rate is not None else 0}
+
+    def rebuild_totals(self):
+        # Re-converts every row from the columns after the rates (or the
+        # currency behind an account id) changed.
+        totals = TotalsIndex()
+        columns = self.columns
+        days = {}
+        for timestamp, amount, account_id, category_id in zip(columns.timestamps, columns.amounts,
+                                                               columns.account_ids, columns.category_ids):
+            day = timestamp // 86400
+            if day not in days:
+                days[day] = (EPOCH_DATE + timedelta(days=day)).isoformat()
+            row = {"datetime": days[day], "amount": amount, "category_id": category_id or None}
+            totals.add(self.base_row(row, self.account_currency(account_id)))
+        self.totals = totals
+
+    def missing_rates(self):
+        return sorted({account["currency"] for account in self.accounts.values()} - self.fx.currencies())
+
+    def convert_month_sums(self, sums):
+        # {(month, key, account id): total} in account currencies to
+        # {(month, key): total} in the base currency. Each currency is one
+        # batch, every month at the rate on its last day. Currencies without
+        # a rate are left out; missing_rates() names them.
+        by_currency = {}
+        for (month, key, account_id), total in sums.items():
+            by_currency.setdefault(self.account_currency(account_id), []).append((month, key, total))
+        result = {}
+        for currency, cells in by_currency.items():
+            days = [date(year, number, calendar.monthrange(year, number)[1]) for (year, number), _, _ in cells]
+            converted = self.fx.convert(currency, [total for _, _, total in cells], days)
+            if converted is None:
+                continue
+            for (month, key, _), total in zip(cells, converted):
+                result[(month, key)] = result.get((month, key), 0) + total
+        return result
+
+    def net_worth(self):
+        # Sum of all balances in the base currency at today's rates, one batch per currency.
+        balances = {}
+        for account in self.accounts.values():
+            balances.setdefault(account["currency"], []).append(account["balance"])
+        total = 0
+        for currency, amounts in balances.items():
+            converted = self.fx.convert(currency, amounts)
+            if converted is not None:
+                total += sum(converted)
+        return total
+
+    def spending_summary(self, today=None):
+        # (spent this month, spent this year) in the base currency, from the
+        # Fenwick trees of the converted totals.
+        today = today or date.today()
+        return self.totals.spent_this_month(today), self.totals.spent_this_year(today)
+
+    """CATEGORIES"""
+
+    def add_category(self, kind, name, icon):
+        category_id = self.store.add_category(kind, name, icon)
+        self.track_write()
+        return self.categories.add({"id": category_id, "kind": kind, "name": name, "icon": icon})
+
+    def delete_categories(self, category_ids):
+        category_ids = set(category_ids)
+        self.store.delete_categories(category_ids)
+        self.track_write()
+        for category_id in category_ids:
+            self.categories.archive(category_id)
+
+    """BUDGETS"""
+
+    def set_category_budget(self, category_id, budget):
+        # budget is a monthly limit in centavos, or None to remove it.
+        self.store.set_category_budget(category_id, budget)
+        self.track_write()
+        self.categories.get(category_id)["budget"] = budget
+
+    def category_spent(self, category_id, year, month):
+        return -self.totals.category_month_total(category_id, year, month)
+
+    def budget_status(self, today=None):
+        # (category, spent, budget) for every expense category with a budget,
+        # for the current month. Each is one lookup in the running totals, so
+        # this costs O(categories) however long the history is.
+        today = today or date.today()
+        return [(category, self.category_spent(category["id"], today.year, today.month), category["budget"])
+                for category in self.categories.section("expenses") if category["budget"]]
+
+    def crossed_budget(self, transaction):
+        # After posting: the (category, spent) this transaction took over its
+        # monthly budget, or None if it stayed within it (or already was over).
+        category = self.categories.by_id.get(transaction["category_id"])
+        if category is None or not category["budget"] or transaction["amount"] >= 0:
+            return None
+        spent = self.category_spent(category["id"], *month_key(transaction))
+        # spent is in the base currency, so the amount is converted the way the totals took it.
+        amount = self.base_row(transaction, self.account_currency(transaction["account_id"]))["amount"]
+        if spent + amount <= category["budget"] < spent:
+            return category, spent
+        return None
+
+    """TRANSACTIONS"""
+
+    def make_transaction(self, account, category_id, amount, notes="", when=None):
+        # The sign comes from the category's kind: income adds to the account.
+        # amount is keypad text; CalculatorError when it does not evaluate to
+        # more than zero.
+        centavos = evaluate_centavos(str(amount))
+        if centavos <= 0:
+            raise CalculatorError("The amount must be more than zero")
+        return self.build_transaction(account, category_id, centavos, notes, when)
+
+    def build_transaction(self, account, category_id, centavos, notes="", when=None):
+        # make_transaction for an amount already in centavos (more than zero,
+        # at most MAX_CENTAVOS) on a date check_date accepts; ValueError otherwise.
+        if not 0 < centavos <= MAX_CENTAVOS:
+            raise ValueError("The amount is out of range")
+        when = check_date(when or datetime.now())
+        category = self.categories.get(category_id)
+        account_id = self.accounts.id_for(account)
+        return {
+            "account": account,
+            "account_id": account_id,
+            "currency": self.account_currency(account_id),
+            "amount": centavos if category["kind"] == "income" else -centavos,
+            "datetime": when.strftime("%Y-%m-%d %H:%M:%S"),
+            "notes": notes,
+            "category": category["name"],
+            "category_id": category_id
+        }
+
+    def check_transaction(self, transaction):
+        # What indexing relies on, checked before the commit so a post lands
+        # in both the store and the indexes or in neither. KeyError for an
+        # unknown account, ValueError for a bad amount or datetime.
+        if transaction["account_id"] not in self.accounts:
+            raise KeyError(transaction["account"])
+        amount = transaction["amount"]
+        if type(amount) is not int or not 0 < abs(amount) <= MAX_CENTAVOS:
+            raise ValueError("The amount is out of range")
+        check_date(parse_time(transaction["datetime"]))
+
+    def post_transaction(self, transaction):
+        self.check_transaction(transaction)
+        transaction["id"] = self.store.add_transaction(
+            transaction["account_id"], transaction["account"], transaction["category_id"], transaction["category"],
+            transaction["amount"], transaction["datetime"], transaction["notes"]
+        )
+        self.track_write()
+        self.index_transaction(transaction)
+        return self.add_to_account(transaction["account_id"], transaction["amount"])
+
+    def post_transactions(self, transactions):
+        # post_transaction for a batch: one commit, and each account's balance
+        # moves once. Nothing is written when any transaction fails
+        # check_transaction. Returns the accounts whose balances changed.
+        deltas = {}
+        for transaction in transactions:
+            self.check_transaction(transaction)
+            deltas[transaction["account_id"]] = deltas.get(transaction["account_id"], 0) + transaction["amount"]
+        if not transactions:
+            return []
+        rows = [(t["account_id"], t["account"], t["category_id"], t["category"], t["amount"], t["datetime"],
+                 t["notes"]) for t in transactions]
+        inserted = self.store.post_transactions(rows, deltas)
+        self.track_write()
+        for transaction, row in zip(transactions, inserted):
+            transaction["id"] = row["id"]
+            self.index_transaction(transaction)
+        return [self.add_to_account(account_id, delta) for account_id, delta in deltas.items()]
+
+    def delete_transaction(self, transaction):
+        self.store.delete_transaction(transaction["id"], transaction["account_id"], transaction["amount"])
+        self.track_write()
+        date_str = self.unindex_transaction(transaction)
+        if transaction["account_id"] in self.accounts:
+            self.subtract_from_account(transaction["account_id"], transaction["amount"])
+        return date_str
+
+    def index_row(self, row, account_id):
+        self.totals.add(self.base_row(row, self.account_currency(account_id)))
+        note_id = self.search.add(row)
+        self.columns.append(row["id"], parse_timestamp(row["datetime"]), row["amount"],
+                            account_id, row["category_id"], note_id)
+
+    def index_transaction(self, transaction):
+        self.index_row(transaction, transaction["account_id"])
+        self.reports.invalidate(transaction["datetime"])
+        # A cached month stays sorted by datetime, so the new transaction is
+        # placed with a binary search instead of re-reading the month.
+        month = self.months.get(month_key(transaction))
+        if month is not None:
+            insort(month, transaction, key=transaction_time)
+        return transaction["datetime"].split()[0]
+
+    def unindex_transaction(self, transaction):
+        self.totals.remove(self.base_row(transaction, self.account_currency(transaction["account_id"])))
+        self.columns.remove(transaction["id"])
+        self.reports.invalidate(transaction["datetime"])
+        self.search.remove(transaction)
+        month = self.months.get(month_key(transaction))
+        if month is not None:
+            remove_sorted(month, transaction)
+        return transaction["datetime"].split()[0]
+
+    def day_total(self, date_str):
+        return self.totals.day_total(date.fromisoformat(date_str))
+
+    def search_transactions(self, text="", account=None, category=None, min_amount=None, max_amount=None,
+                            start=None, end=None):
+        # Matching transactions' ids, newest first; read them back in slices
+        # with transactions_for_ids(). end is the last day included.
+        account_id = None
+        if account is not None:
+            account_id = self.accounts.id_for(account)
+            if account_id is None:
+                return []
+        category_id = None
+        if category is not None:
+            category_id = self.categories.id_for(category)
+            if category_id is None:
+                return []
+        if end is not None:
+            end = end + timedelta(days=1)
+        return self.search.query(text, account_id, category_id, min_amount, max_amount, start, end)
+
+    def transactions_for_ids(self, ids):
+        if hasattr(ids, "tolist"):
+            ids = ids.tolist()
+        return [self.transaction_from_row(row) for row in self.store.transactions_by_ids(ids)]
+
+    """HISTORY"""
+
+    def history_months(self):
+        return self.totals.active_months()
+
+    def month_transactions(self, year, month):
+        # One month's transactions, oldest first, from a small LRU of months.
+        key = (year, month)
+        transactions = self.months.get(key)
+        if transactions is not None:
+            self.months.move_to_end(key)
+            return transactions
+
+        last_day = calendar.monthrange(year, month)[1]
+        rows = self.store.iter_transactions(start=f"{year:04d}-{month:02d}-01",
+                                            end=f"{year:04d}-{month:02d}-{last_day:02d}")
+        transactions = self.months[key] = [self.transaction_from_row(row) for row in rows]
+        while len(self.months) > MONTH_CACHE_SIZE:
+            self.months.popitem(last=False)
+        return transactions
+
+    @traced("ledger.month_groups")
+    def month_groups(self, year, month):
+        # (date_str, transactions newest first, day total) per day, newest day first.
+        groups = []
+        for transaction in reversed(self.month_transactions(year, month)):
+            date_str = transaction["datetime"][:10]
+            if not groups or groups[-1][0] != date_str:
+                groups.append((date_str, [], self.day_total(date_str)))
+            groups[-1][1].append(transaction)
+        return groups
+
+    def month_summary(self, year, month):
+        first = date(year, month, 1)
+        last = date(year, month, calendar.monthrange(year, month)[1])
+        return self.totals.spent_between(first, last), self.totals.earned_between(first, last)
+
+    """RECURRING"""
+
+    def load_recurring(self):
+        self.recurring = RecurringScheduler()
+        for row in self.store.load_recurring():
+            self.recurring.add(dict(row))
+
+    def add_recurring(self, transaction, frequency, interval=1):
+        # Repeats a posted transaction every `interval` periods after its own date.
+        rule = {
+            "account_id": transaction["account_id"],
+            "category_id": transaction["category_id"],
+            "amount": transaction["amount"],
+            "notes": transaction["notes"],
+            "frequency": frequency,
+            "interval": interval,
+            "start": transaction["datetime"],
+        }
+        rule["next_due"] = format_time(check_date(next_occurrence(rule, parse_time(rule["start"]))))
+        rule["id"] = self.store.add_recurring(
+            rule["account_id"], rule["category_id"], rule["amount"], rule["notes"], frequency, interval,
+            rule["start"], rule["next_due"]
+        )
+        self.track_write()
+        return self.recurring.add(rule)
+
+    def delete_recurring(self, rule_id):
+        self.store.delete_recurring(rule_id)
+        self.track_write()
+        self.recurring.remove(rule_id)
+
+    def post_due_recurring(self, now=None):
+        # Every occurrence missed up to now (say, months of a daily rule after
+        # the app was closed) is written in one commit and each account's
+        # balance moves once. Rules for deleted accounts or archived categories
+        # are moved on without posting. Returns the new transactions, oldest first, and the
+        # accounts whose balances changed.
+        occurrences, next_due = self.recurring.due(now or datetime.now())
+        transactions = []
+        deltas = {}
+        for rule, when in occurrences:
+            category = self.categories.by_id.get(rule["category_id"])
+            if rule["account_id"] not in self.accounts or category is None or category["archived"]:
+                continue
+            transactions.append({
+                "account": self.accounts.get(rule["account_id"])["name"],
+                "account_id": rule["account_id"],
+                "currency": self.account_currency(rule["account_id"]),
+                "amount": rule["amount"],
+                "datetime": when,
+                "notes": rule["notes"],
+                "category": category["name"],
+                "category_id": category["id"]
+            })
+            deltas[rule["account_id"]] = deltas.get(rule["account_id"], 0) + rule["amount"]
+        if not next_due:
+            return [], []
+
+        rows = [(t["account_id"], t["account"], t["category_id"], t["category"], t["amount"], t["datetime"],
+                 t["notes"]) for t in transactions]
+        try:
+            inserted = self.store.post_recurring(rows, deltas, next_due)
+        except Exception:
+            self.recurring.reschedule({rule_id: self.recurring.rules[rule_id]["next_due"] for rule_id in next_due})
+            raise
+        self.track_write()
+        self.recurring.reschedule(next_due)
+        for transaction, row in zip(transactions, inserted):
+            transaction["id"] = row["id"]
+            self.index_transaction(transaction)
+        return transactions, [self.add_to_account(account_id, delta) for account_id, delta in deltas.items()]
@@ -1,30 +1,72 @@
-import os
+import queue
 import tkinter as tk
-from datetime import datetime
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
+from datetime import date, datetime
+from tkinter import ttk, messagebox, filedialog
+from calc import CalculatorError, evaluate
+from icons import icon_cache, list_icons
+from importer import UNCATEGORIZED, ImportJob
+from ledger import Ledger
+from money import (BASE_CURRENCY, CURRENCY_SYMBOLS, currency_symbol, format_balance, format_day_total, format_money,
+                   format_pesos, format_plain, parse_money)
+from recurring import parse_time
+from reports import REPORT_VIEWS
+from storage import LedgerStore
+from tracing import Heartbeat, traced, tracer
+from widgets import TransactionListView
+from workers import WorkerPool
+
+ALL_ACCOUNTS = "All accounts"
+ALL_CATEGORIES = "All categories"
+SEARCH_DELAY_MS = 150
+SEARCH_CHUNK = 2000
+# Months of history the Transactions list holds at once while scrolling.
+HISTORY_MONTHS = 3
+# Longest sleep of the recurring-transactions timer, so time spent
+# suspended is caught up soon after waking.
+RECURRING_CHECK_MS = 60000
+REPEAT_CHOICES = {"Never": None, "Daily": "daily", "Weekly": "weekly", "Monthly": "monthly", "Every N days": "custom"}
+REPEAT_UNITS = {"daily": "days", "weekly": "weeks", "monthly": "months", "custom": "days"}
+
 
 class BudgetTracker:
-    def __init__(self, root):
+    def __init__(self, root, ledger):
         self.root = root
         self.root.title("Budget Tracker")
         self.root.geometry("600x600")
         self.root.minsize(600, 400)
-        self.categories = []
+        self.ledger = ledger
+        self.categories = ledger.categories
+        self.workers = WorkerPool(root)
+        self.category_jobs = None
+        self.icon_jobs = None
+        # Occurrences missed while the app was closed are posted before the
+        # tabs are built, so they cost no redraw at all.
+        self.ledger.post_due_recurring()
+        self.recurring_after = None
         self.create_tabs()
         self.create_accounts_tab()
         self.edit_mode = False
         self.delete_button = None
         self.create_categories_tab()
+        self.import_job = None
+        self.search_after = None
+        self.search_stream = None
         self.create_transactions_tab()
-        self.transactions = []
+        self.create_reports_tab()
         self.modal = None
         self.overlay = None
         self.account_type = None
+        self.on_account_selected = None
+        self.net_worth_after = None
 
         style = ttk.Style()
         style.configure("Treeview", font=("Arial", 10, "bold"))
-        self.accounts_tree.insert("", tk.END, values=("Regular", "Cash", "₱ 165.69"))
+        style.configure("Over.Horizontal.TProgressbar", background="#d9534f")
+        for account in self.ledger.accounts.values():
+            account["item"] = self.accounts_tree.insert("", tk.END, iid=str(account["id"]), values=(
+                account["type"], account["name"], format_balance(account["balance"], account["currency"])))
+        self.update_net_worth()
+        self.schedule_recurring()
 
     def open_centered_window(self, window, width, height):
         root_x = self.root.winfo_x()
@@ -37,17 +79,36 @@ class BudgetTracker:
 
         window.geometry(f"{width}x{height}+{x_position}+{y_position}")
 
+    def load_icon(self, widget, path, size, jobs, images):
+        # Shows whatever is ready now (the icon or a placeholder) and swaps
+        # the real icon in when a worker has decoded it.
+        def show(photo):
+            if photo is not None and widget.winfo_exists():
+                images.append(photo)
+                widget.config(image=photo)
+
+        show(icon_cache.request(path, size, show, jobs))
+
     def create_tabs(self):
         notebook = ttk.Notebook(self.root)
         self.accounts_tab = ttk.Frame(notebook)
         self.categories_tab = ttk.Frame(notebook)
         self.transactions_tab = ttk.Frame(notebook)
+        self.reports_tab = ttk.Frame(notebook)
 
         notebook.add(self.accounts_tab, text="Accounts")
         notebook.add(self.categories_tab, text="Categories")
         notebook.add(self.transactions_tab, text="Transactions")
+        notebook.add(self.reports_tab, text="Reports")
 
         notebook.pack(expand=True, fill="both")
+        notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.notebook = notebook
+
+    def on_tab_changed(self, event):
+        # Reports are only computed while visible; cached months make reopening cheap.
+        if self.notebook.select() == str(self.reports_tab):
+            self.refresh_reports()
 
     """ACCOUNTS"""
 
@@ -91,6 +152,9 @@ class BudgetTracker:
         )
         delete_accounts_button.place(relx=0.68, rely=0.94, anchor="center")
 
+        self.net_worth_label = ttk.Label(self.accounts_tab, font=("Arial", 10, "bold"))
+        self.net_worth_label.place(relx=0.03, rely=0.94, anchor="w")
+
     def toggle_deletion_mode(self):
         self.deletion_mode = not self.deletion_mode
         if self.deletion_mode:
@@ -119,7 +183,9 @@ class BudgetTracker:
                 if item:
                     confirm = messagebox.askyesno("Confirm Deletion", "Are you sure you want to delete this account?")
                     if confirm:
+                        self.ledger.delete_account(int(item))
                         self.accounts_tree.delete(item)
+                        self.schedule_net_worth()
 
     def show_add_account_modal(self):
         if self.modal is not None:
@@ -130,7 +196,7 @@ class BudgetTracker:
         self.overlay.bind("<Button-1>", lambda event: self.close_modal())
 
         self.modal = ttk.Frame(self.root, relief="raised", borderwidth=2)
-        self.modal.place(relx=0.5, rely=0.5, anchor="center", width=300, height=225)
+        self.modal.place(relx=0.5, rely=0.5, anchor="center", width=300, height=270)
 
         ttk.Label(self.modal, text=f"Account Type: {self.account_type}").pack(side="top", anchor="w", padx=10,
                                                                               pady=(10, 5))
@@ -139,8 +205,13 @@ class BudgetTracker:
         account_entry.pack(pady=5, fill='x', padx=10)
 
         ttk.Label(self.modal, text="Balance:").pack(pady=5)
-        balance_entry = ttk.Entry(self.modal)
-        balance_entry.pack(pady=5, fill='x', padx=10)
+        balance_row = ttk.Frame(self.modal)
+        balance_row.pack(pady=5, fill='x', padx=10)
+        currency_choice = ttk.Combobox(balance_row, state="readonly", width=6, values=list(CURRENCY_SYMBOLS))
+        currency_choice.set(BASE_CURRENCY)
+        currency_choice.pack(side="left", padx=(0, 5))
+        balance_entry = ttk.Entry(balance_row)
+        balance_entry.pack(side="left", fill='x', expand=True)
 
         def add_account():
             account_name = account_entry.get().strip()
@@ -148,15 +219,21 @@ class BudgetTracker:
             if not account_name or not balance:
                 messagebox.showerror("Invalid Input", "All fields must be filled.")
                 return
+            if self.ledger.accounts.find(account_name) is not None:
+                messagebox.showerror("Invalid Input", "An account with that name already exists.")
+                return
             try:
-                balance = float(balance)
-                formatted_balance = f"₱ {balance:,.2f}"
-                item = self.accounts_tree.insert("", tk.END,
+                account = self.ledger.add_account(self.account_type, account_name, parse_money(balance),
+                                                  currency_choice.get())
+                formatted_balance = format_balance(account["balance"], account["currency"])
+                item = self.accounts_tree.insert("", tk.END, iid=str(account["id"]),
                                                  values=(self.account_type, account_name, formatted_balance, "Delete"))
+                account["item"] = item
                 self.accounts_tree.item(item, tags=("account_name", "account_type", "balance"))
                 self.accounts_tree.tag_configure("account_name", font=("Arial", 10, "bold"), foreground="black")
                 self.accounts_tree.tag_configure("account_type", font=("Arial", 10), foreground="gray")
                 self.accounts_tree.tag_configure("balance", font=("Arial", 10, "bold"), foreground="black")
+                self.schedule_net_worth()
                 self.close_modal()
             except ValueError:
                 messagebox.showerror("Invalid Input", "Balance must be a valid number.")
@@ -170,20 +247,32 @@ class BudgetTracker:
         cancel_button = ttk.Button(button_frame, text="Cancel", command=self.close_modal)
         cancel_button.pack(side="right", padx=5)
 
-    def subtract_from_account(self, account_name, amount):
-        try:
-            amount = float(amount)
-            for item in self.accounts_tree.get_children():
-                values = self.accounts_tree.item(item, "values")
-                if values[1] == account_name:
-                    current_balance = float(values[2].replace("₱", "").replace(",", "").strip())
-                    new_balance = current_balance - amount
-                    formatted_balance = f"₱ {new_balance:,.2f}"
-                    self.accounts_tree.item(item, values=(values[0], values[1], formatted_balance))
-                    return
-            messagebox.showerror("Error", "Account not found.")
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Amount must be a valid number.")
+    @traced("account.balance_update")
+    def update_account_balance(self, account):
+        if account["item"] is not None:
+            self.accounts_tree.set(account["item"], "Balance", format_balance(account["balance"], account["currency"]))
+        self.schedule_net_worth()
+
+    def schedule_net_worth(self):
+        # Balance updates come in bursts (a save, a recurring catch-up); the
+        # net worth is converted once when the burst is over.
+        if self.net_worth_after is None:
+            self.net_worth_after = self.root.after_idle(self.update_net_worth)
+
+    def refresh_rates(self):
+        # Day, month and budget totals are held in pesos, so new rates redraw them.
+        if self.ledger.refresh_rates():
+            self.refresh_transactions()
+            self.refresh_budget_bars()
+
+    def update_net_worth(self):
+        self.net_worth_after = None
+        self.refresh_rates()
+        text = f"Net worth: {format_balance(self.ledger.net_worth())}"
+        missing = self.ledger.missing_rates()
+        if missing:
+            text += f"  (no rate for {', '.join(missing)})"
+        self.net_worth_label.config(text=text)
 
     def show_account_type_modal(self):
         if self.modal is not None:
@@ -202,14 +291,9 @@ class BudgetTracker:
         content_frame = ttk.Frame(self.modal)
         content_frame.pack(expand=True, fill="both", pady=10)
 
-        self.wallet_icon = Image.open("icons/wallet.png").resize((20, 20), Image.LANCZOS)
-        self.wallet_photo = ImageTk.PhotoImage(self.wallet_icon)
-
-        self.debt_icon = Image.open("icons/salary.png").resize((20, 20), Image.LANCZOS)
-        self.debt_photo = ImageTk.PhotoImage(self.debt_icon)
-
-        self.savings_icon = Image.open("icons/money.png").resize((20, 20), Image.LANCZOS)
-        self.savings_photo = ImageTk.PhotoImage(self.savings_icon)
+        self.wallet_photo = icon_cache.get("icons/wallet.png", (20, 20))
+        self.debt_photo = icon_cache.get("icons/salary.png", (20, 20))
+        self.savings_photo = icon_cache.get("icons/money.png", (20, 20))
 
         ttk.Button(
             content_frame,
@@ -246,29 +330,12 @@ class BudgetTracker:
     """CATEGORIES"""
 
     def create_categories_tab(self):
-        if not hasattr(self, "categories") or not self.categories:
-            self.categories = {
-                "expenses": [
-                    {"icon": "icons/category icons/food.png", "name": "Food"},
-                    {"icon": "icons/category icons/transport.png", "name": "Transport"},
-                    {"icon": "icons/category icons/shopping.png", "name": "Shopping"},
-                    {"icon": "icons/category icons/entertainment.png", "name": "Entertainment"},
-                    {"icon": "icons/category icons/health.png", "name": "Health"},
-                    {"icon": "icons/category icons/education.png", "name": "Education"},
-                    {"icon": "icons/category icons/bills.png", "name": "Bills"},
-                    {"icon": "icons/category icons/savings.png", "name": "Savings"},
-                ],
-                "income": [
-                    {"icon": "icons/category icons/salary (1).png", "name": "Salary"},
-                    {"icon": "icons/category icons/allowance.png", "name": "Allowance"}
-                ]
-            }
-
         for widget in self.categories_tab.winfo_children():
             widget.destroy()
 
         self.update_categories_display()
 
+    @traced("categories.display")
     def update_categories_display(self):
         for widget in self.categories_tab.winfo_children():
             widget.destroy()
@@ -279,6 +346,10 @@ class BudgetTracker:
             frame.grid_columnconfigure(col, weight=1)
 
         self.category_images = []
+        self.budget_bars = {}
+        if self.category_jobs is not None:
+            self.category_jobs.cancel()
+        self.category_jobs = self.workers.group()
 
         if self.edit_mode:
             self.category_check_vars = {"expenses": {}, "income": {}}
@@ -291,24 +362,21 @@ class BudgetTracker:
         for col in range(6):
             expenses_frame.grid_columnconfigure(col, weight=1)
 
-        for i, category in enumerate(self.categories.get("expenses", [])):
-            try:
-                img = Image.open(category["icon"]).resize((70, 70), Image.LANCZOS)
-            except Exception:
-                img = Image.open("icons/placeholder.png").resize((70, 70), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            self.category_images.append(photo)
+        for i, category in enumerate(self.categories.section("expenses")):
             row, col = divmod(i, 5)
             category_frame = ttk.Frame(expenses_frame, borderwidth=2, relief="flat")
             category_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            label = ttk.Label(category_frame, image=photo, text=category["name"],
-                              compound="top", padding=5)
+            label = ttk.Label(category_frame, text=category["name"], compound="top", padding=5)
+            self.load_icon(label, category["icon"], (70, 70), self.category_jobs, self.category_images)
             label.pack()
+            if category["budget"]:
+                self.add_budget_bar(category_frame, category)
 
             if not self.edit_mode:
                 label.bind("<Enter>", lambda event, f=category_frame: f.config(relief="solid"))
                 label.bind("<Leave>", lambda event, f=category_frame: f.config(relief="flat"))
                 label.bind("<Button-1>", lambda event, c=category: self.show_add_transaction(c))
+                label.bind("<Button-3>", lambda event, c=category: self.show_budget_modal(c))
             else:
                 var = tk.BooleanVar()
                 self.category_check_vars["expenses"][i] = var
@@ -317,14 +385,10 @@ class BudgetTracker:
                 cb.pack(anchor="center", pady=2)
 
         if self.edit_mode:
-            try:
-                plus_img = Image.open("icons/add.png").resize((70, 70), Image.LANCZOS)
-            except Exception:
-                plus_img = Image.open("icons/placeholder.png").resize((70, 70), Image.LANCZOS)
-            plus_photo = ImageTk.PhotoImage(plus_img)
+            plus_photo = icon_cache.get("icons/add.png", (70, 70))
             self.category_images.append(plus_photo)
             plus_frame = ttk.Frame(expenses_frame, borderwidth=2, relief="flat")
-            row, col = divmod(len(self.categories.get("expenses", [])), 5)
+            row, col = divmod(len(self.categories.section("expenses")), 5)
             plus_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
             plus_button = ttk.Button(plus_frame, image=plus_photo, command=self.show_add_category_modal)
             plus_button.pack()
@@ -339,18 +403,12 @@ class BudgetTracker:
         for col in range(6):
             income_frame.grid_columnconfigure(col, weight=1)
 
-        for i, category in enumerate(self.categories.get("income", [])):
-            try:
-                img = Image.open(category["icon"]).resize((70, 70), Image.LANCZOS)
-            except Exception:
-                img = Image.open("icons/placeholder.png").resize((70, 70), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            self.category_images.append(photo)
+        for i, category in enumerate(self.categories.section("income")):
             row, col = divmod(i, 5)
             category_frame = ttk.Frame(income_frame, borderwidth=2, relief="flat")
             category_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            label = ttk.Label(category_frame, image=photo, text=category["name"],
-                              compound="top", padding=5)
+            label = ttk.Label(category_frame, text=category["name"], compound="top", padding=5)
+            self.load_icon(label, category["icon"], (70, 70), self.category_jobs, self.category_images)
             label.pack()
 
             if not self.edit_mode:
@@ -365,14 +423,10 @@ class BudgetTracker:
                 cb.pack(anchor="center", pady=2)
 
         if self.edit_mode:
-            try:
-                plus_img = Image.open("icons/add.png").resize((70, 70), Image.LANCZOS)
-            except Exception:
-                plus_img = Image.open("icons/placeholder.png").resize((70, 70), Image.LANCZOS)
-            plus_photo = ImageTk.PhotoImage(plus_img)
+            plus_photo = icon_cache.get("icons/add.png", (70, 70))
             self.category_images.append(plus_photo)
             plus_frame = ttk.Frame(income_frame, relief="flat")
-            row, col = divmod(len(self.categories.get("income", [])), 5)
+            row, col = divmod(len(self.categories.section("income")), 5)
             plus_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
             plus_button = ttk.Button(plus_frame, image=plus_photo, command=self.show_add_category_modal)
             plus_button.pack()
@@ -391,6 +445,56 @@ class BudgetTracker:
             self.delete_button.destroy()
             self.delete_button = None
 
+    def add_budget_bar(self, parent, category):
+        bar = ttk.Progressbar(parent, length=70)
+        bar.pack()
+        caption = ttk.Label(parent, font=("Arial", 8))
+        caption.pack()
+        self.budget_bars[category["id"]] = (bar, caption)
+        self.update_budget_bar(category)
+
+    def update_budget_bar(self, category):
+        widgets = self.budget_bars.get(category["id"])
+        if widgets is None or not category["budget"]:
+            return
+        bar, caption = widgets
+        today = date.today()
+        spent = self.ledger.category_spent(category["id"], today.year, today.month)
+        budget = category["budget"]
+        bar.config(maximum=budget, value=min(max(spent, 0), budget),
+                   style="Over.Horizontal.TProgressbar" if spent > budget else "Horizontal.TProgressbar")
+        caption.config(text=f"{format_money(spent)} / {format_money(budget)}")
+
+    def refresh_budget_bars(self):
+        for category, spent, budget in self.ledger.budget_status():
+            self.update_budget_bar(category)
+
+    def show_budget_modal(self, category):
+        window = tk.Toplevel(self.root)
+        window.title("Monthly Budget")
+        self.open_centered_window(window, 240, 130)
+
+        ttk.Label(window, text=f"Monthly limit for {category['name']}").pack(pady=(10, 5))
+        entry = ttk.Entry(window, justify="center")
+        if category["budget"]:
+            entry.insert(0, format_plain(category["budget"]))
+        entry.pack(fill="x", padx=10)
+        entry.focus_set()
+
+        def save():
+            text = entry.get().strip()
+            try:
+                budget = parse_money(text) if text else None
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Amount must be a valid number.")
+                return
+            self.ledger.set_category_budget(category["id"], budget if budget and budget > 0 else None)
+            window.destroy()
+            self.update_categories_display()
+
+        ttk.Label(window, text="Leave blank for no limit.", font=("Arial", 8)).pack()
+        ttk.Button(window, text="Save", command=save).pack(pady=5)
+
     def toggle_edit_mode(self):
         self.edit_mode = not self.edit_mode
         self.update_categories_display()
@@ -415,18 +519,12 @@ class BudgetTracker:
                 self.delete_button = None
 
     def delete_selected_categories(self):
-        new_expenses = []
-        for i, cat in enumerate(self.categories.get("expenses", [])):
-            if i in self.category_check_vars["expenses"] and self.category_check_vars["expenses"][i].get():
-                continue
-            new_expenses.append(cat)
-        new_income = []
-        for i, cat in enumerate(self.categories.get("income", [])):
-            if i in self.category_check_vars["income"] and self.category_check_vars["income"][i].get():
-                continue
-            new_income.append(cat)
-        self.categories["expenses"] = new_expenses
-        self.categories["income"] = new_income
+        deleted_ids = []
+        for kind in ("expenses", "income"):
+            for i, cat in enumerate(self.categories.section(kind)):
+                if i in self.category_check_vars[kind] and self.category_check_vars[kind][i].get():
+                    deleted_ids.append(cat["id"])
+        self.ledger.delete_categories(deleted_ids)
         self.update_categories_display()
 
     def show_add_category_modal(self):
@@ -443,8 +541,7 @@ class BudgetTracker:
         ttk.Label(self.modal, text="Choose an icon:").pack(pady=5)
 
         self.selected_icon = "icons/placeholder.png"
-        self.icon_img = Image.open(self.selected_icon).resize((50, 50), Image.LANCZOS)
-        self.icon_photo = ImageTk.PhotoImage(self.icon_img)
+        self.icon_photo = icon_cache.get(self.selected_icon, (50, 50))
 
         self.icon_label = ttk.Label(self.modal, image=self.icon_photo)
         self.icon_label.pack(pady=5)
@@ -478,30 +575,43 @@ class BudgetTracker:
 
         self.icon_images = []
         self.icon_buttons = []
+        loading_label = ttk.Label(frame, text="Loading icons...")
+        loading_label.grid(row=0, column=0, columnspan=5)
+
+        # The folder listing and any icon decodes run on workers; closing the
+        # picker early cancels whatever is still outstanding.
+        if self.icon_jobs is not None:
+            self.icon_jobs.cancel()
+        jobs = self.icon_jobs = self.workers.group()
+        icon_window.protocol("WM_DELETE_WINDOW", lambda: self.close_icon_window(icon_window))
+
+        def show_icons(icon_paths):
+            loading_label.destroy()
+            for i, icon_path in enumerate(icon_paths[:20]):
+                button = ttk.Button(frame, command=lambda p=icon_path: self.select_icon(p, icon_window))
+                self.load_icon(button, icon_path, (50, 50), jobs, self.icon_images)
+                button.grid(row=i//5, column=i%5, padx=5, pady=5)
+                self.icon_buttons.append(button)
+
+        jobs.submit(list_icons, callback=show_icons,
+                    on_error=lambda error: loading_label.config(text="Could not read the icons folder."))
+
+    def close_icon_window(self, window):
+        if self.icon_jobs is not None:
+            self.icon_jobs.cancel()
+            self.icon_jobs = None
+        window.destroy()
 
-        icon_folder = "icons/category icons"
-        icon_files = [f for f in os.listdir(icon_folder) if f.endswith(".png")]
-
-        for i, icon_file in enumerate(icon_files[:20]):
-            img = Image.open(os.path.join(icon_folder, icon_file)).resize((50, 50), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            self.icon_images.append(photo)
-
-            button = ttk.Button(frame, image=photo, command=lambda i=i: self.select_icon(i, icon_window))
-            button.grid(row=i//5, column=i%5, padx=5, pady=5)
-            self.icon_buttons.append(button)
-
-    def select_icon(self, index, window):
-        self.selected_icon = f"icons/category icons/{os.listdir('icons/category icons')[index]}"
+    def select_icon(self, icon_path, window):
+        self.selected_icon = icon_path
 
-        self.icon_img = Image.open(self.selected_icon).resize((50, 50), Image.LANCZOS)
-        self.icon_photo = ImageTk.PhotoImage(self.icon_img)
+        self.icon_photo = icon_cache.get(self.selected_icon, (50, 50))
         self.icon_label.config(image=self.icon_photo)
         self.icon_label.image = self.icon_photo
 
         self.choose_icon_button.config(text="Change Icon")
 
-        window.destroy()
+        self.close_icon_window(window)
 
     def add_category(self):
         category_name = self.category_entry.get().strip()
@@ -509,39 +619,20 @@ class BudgetTracker:
             messagebox.showerror("Invalid Input", "Category name must be filled.")
             return
 
-        self.categories["expenses"].append({"icon": self.selected_icon, "name": category_name})
+        self.ledger.add_category("expenses", category_name, self.selected_icon)
         self.update_categories_display()
         self.close_modal()
 
-    def add_to_account(self, account_name, amount):
-        try:
-            amount = float(amount)
-            for item in self.accounts_tree.get_children():
-                values = self.accounts_tree.item(item, "values")
-                if values[1] == account_name:
-                    current_balance = float(values[2].replace("₱", "").replace(",", "").strip())
-                    new_balance = current_balance + amount
-                    formatted_balance = f"₱ {new_balance:,.2f}"
-                    self.accounts_tree.item(item, values=(values[0], values[1], formatted_balance))
-                    return
-            messagebox.showerror("Error", "Account not found.")
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Amount must be a valid number.")
-
     def show_add_transaction(self, category):
         if self.modal is not None:
             return
 
-        is_income = False
-        if "income" in self.categories:
-            income_names = [cat["name"] for cat in self.categories["income"]]
-            if category["name"] in income_names:
-                is_income = True
+        is_income = category["kind"] == "income"
 
         self.overlay = tk.Frame(self.root, bg="gray75")
         self.overlay.place(relx=0, rely=0, relwidth=1, relheight=1)
         self.modal = ttk.Frame(self.overlay, relief="raised", borderwidth=2)
-        self.modal.place(relx=0.5, rely=0.5, anchor="center", width=300, height=420)
+        self.modal.place(relx=0.5, rely=0.5, anchor="center", width=300, height=450)
 
         top_frame = ttk.Frame(self.modal)
         top_frame.pack(fill="x", padx=10, pady=10)
@@ -575,16 +666,26 @@ class BudgetTracker:
             ttk.Label(right_frame, text="To Category", font=("Arial", 8)).pack()
             ttk.Label(right_frame, text=category["name"], font=("Arial", 12, "bold")).pack()
 
-        input_var = tk.StringVar(value="₱")
+        # The amount is prefixed with the chosen account's currency symbol.
+        symbol = currency_symbol(self.ledger.account_currency(self.ledger.accounts.id_for("Cash")))
+        input_var = tk.StringVar(value=symbol)
         input_entry = tk.Entry(self.modal, textvariable=input_var, font=("Arial", 18), bd=0, justify="center")
 
         def validate_input(P):
-            if P == "₱":
+            if P == symbol:
                 return False
-            elif P.startswith("₱") and all(char.isdigit() or char in ".+-*/x" for char in P[1:]):
+            elif P.startswith(symbol) and all(char.isdigit() or char in ".+-*/x" for char in P[len(symbol):]):
                 return True
             return False
 
+        def set_account_currency(account_name):
+            nonlocal symbol
+            old_symbol = symbol
+            symbol = currency_symbol(self.ledger.account_currency(self.ledger.accounts.id_for(account_name)))
+            input_var.set(symbol + input_var.get()[len(old_symbol):])
+
+        self.on_account_selected = set_account_currency
+
         def on_key_press(event):
             allowed_chars = "0123456789.+-*/x"
             if event.keysym in ["Return", "KP_Enter"]:
@@ -618,29 +719,52 @@ class BudgetTracker:
         notes_entry.bind("<FocusOut>", on_focus_out)
         notes_entry.pack(fill="x", padx=10, pady=5)
 
+        repeat_frame = ttk.Frame(self.modal)
+        repeat_frame.pack(fill="x", padx=10)
+        ttk.Label(repeat_frame, text="Repeat", font=("Arial", 8)).pack(side="left")
+        repeat_choice = ttk.Combobox(repeat_frame, state="readonly", width=12, values=list(REPEAT_CHOICES))
+        repeat_choice.set("Never")
+        repeat_choice.pack(side="left", padx=5)
+        repeat_unit = ttk.Label(repeat_frame, font=("Arial", 8))
+        repeat_unit.pack(side="right")
+        repeat_every = ttk.Spinbox(repeat_frame, from_=1, to=365, width=4)
+        repeat_every.set(1)
+
+        def on_repeat_selected(event):
+            frequency = REPEAT_CHOICES[repeat_choice.get()]
+            if frequency is None:
+                repeat_every.pack_forget()
+                repeat_unit.config(text="")
+            else:
+                repeat_every.pack(side="right", before=repeat_unit)
+                repeat_unit.config(text=REPEAT_UNITS[frequency])
+
+        repeat_choice.bind("<<ComboboxSelected>>", on_repeat_selected)
+
         calc_frame = ttk.Frame(self.modal)
         calc_frame.pack(pady=10, fill="both", expand=True)
 
         def on_button_click(value):
             current_text = input_var.get()
             if value in ["C", "CA"]:
-                if len(current_text) > 1:
+                if len(current_text) > len(symbol):
                     input_var.set(current_text[:-1])
                 else:
-                    input_var.set("₱")
+                    input_var.set(symbol)
             elif value == "✔":
                 try:
-                    expression = current_text[1:].replace("x", "*").strip()
+                    expression = current_text[len(symbol):].strip()
                     if expression:
-                        result = eval(expression)
-                        input_var.set(f"₱{round(result, 2)}")
-                except ZeroDivisionError:
-                    input_var.set("₱0")
-                except Exception:
-                    input_var.set("₱0")
+                        result = evaluate(expression)
+                        if result <= 0:
+                            messagebox.showerror("Invalid Amount", "The amount must be more than zero.")
+                            return
+                        input_var.set(f"{symbol}{result}")
+                except CalculatorError:
+                    input_var.set(f"{symbol}0")
             else:
-                if current_text == "₱0":
-                    input_var.set(f"₱{value}")
+                if current_text == f"{symbol}0":
+                    input_var.set(f"{symbol}{value}")
                 else:
                     input_var.set(current_text + value)
 
@@ -648,7 +772,7 @@ class BudgetTracker:
             ["/", "7", "8", "9", "C"],
             ["*", "4", "5", "6", "CA"],
             ["-", "1", "2", "3", "✔"],
-            ["+", "₱", "0", ".", ""]
+            ["+", symbol, "0", ".", ""]
         ]
         for r, row in enumerate(buttons):
             for c, char in enumerate(row):
@@ -667,42 +791,43 @@ class BudgetTracker:
         button_frame = ttk.Frame(self.modal)
         button_frame.pack(fill='x', padx=10, pady=10)
 
+        @traced("transaction.save")
         def save_transaction():
             if is_income:
                 account_used = self.to_account_label.cget("text")
             else:
                 account_used = self.from_account_label.cget("text")
-            amount_spent = input_var.get()
-            transaction_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             notes = notes_entry.get() if notes_entry.get() != "Notes..." else ""
-            category_spent = category["name"]
-
-            amount_numeric = amount_spent.replace("₱", "").strip()
             try:
-                amount_value = float(amount_numeric)
-            except:
-                amount_value = 0
-
-            if is_income:
-                display_amount = f"+ ₱{amount_value:,.2f}"
-            else:
-                display_amount = f"- ₱{amount_value:,.2f}"
-
-            transaction = {
-                "account": account_used,
-                "amount": display_amount,
-                "datetime": transaction_time,
-                "notes": notes,
-                "category": category_spent
-            }
-            print("DEBUG: Storing transaction:", transaction)
-            self.transactions.append(transaction)
-            if is_income:
-                self.add_to_account(account_used, amount_numeric)
-            else:
-                self.subtract_from_account(account_used, amount_numeric)
-            self.create_transactions_tab()
+                transaction = self.ledger.make_transaction(account_used, category["id"],
+                                                           input_var.get()[len(symbol):], notes)
+            except CalculatorError as error:
+                messagebox.showerror("Invalid Amount", str(error))
+                return
+            try:
+                self.update_account_balance(self.ledger.post_transaction(transaction))
+            except KeyError:
+                messagebox.showerror("Error", "Account not found.")
+                return
+            self.show_new_transaction(transaction)
+            self.update_budget_bar(category)
+            crossed = self.ledger.crossed_budget(transaction)
+            frequency = REPEAT_CHOICES[repeat_choice.get()]
+            if frequency is not None:
+                try:
+                    interval = max(1, int(repeat_every.get()))
+                except ValueError:
+                    interval = 1
+                self.ledger.add_recurring(transaction, frequency, interval)
+                self.schedule_recurring()
             self.close_modal()
+            if crossed is not None:
+                over_category, spent = crossed
+                messagebox.showwarning(
+                    "Over Budget",
+                    f"{over_category['name']} is at {format_money(spent)} this month, "
+                    f"over its {format_money(over_category['budget'])} budget."
+                )
 
         add_button = ttk.Button(button_frame, text="Add", command=save_transaction)
         add_button.pack(side="right", padx=5)
@@ -720,12 +845,7 @@ class BudgetTracker:
         frame = ttk.Frame(self.account_modal)
         frame.pack(expand=True, fill="both", padx=10, pady=10)
 
-        account_ids = self.accounts_tree.get_children()
-        accounts = []
-        for aid in account_ids:
-            values = self.accounts_tree.item(aid, "values")
-            if len(values) >= 2:
-                accounts.append(values[1])
+        accounts = self.ledger.accounts.names()
 
         if not accounts:
             accounts = ["Cash", "Savings", "Credit Card", "Investments"]
@@ -737,106 +857,339 @@ class BudgetTracker:
     def select_account(self, account):
         if hasattr(self, "account_selection_target"):
             self.account_selection_target.config(text=account)
+            if self.on_account_selected is not None:
+                self.on_account_selected(account)
         else:
             messagebox.showerror("Error", "No account selection target defined.")
         self.account_modal.destroy()
 
     """TRANSACTONS"""
 
+    @traced("transactions_tab.build")
     def create_transactions_tab(self):
         for widget in self.transactions_tab.winfo_children():
             widget.destroy()
 
-        frame = ttk.Frame(self.transactions_tab)
-        frame.pack(expand=True, fill="both", padx=10, pady=10)
+        self.spending_label = ttk.Label(self.transactions_tab, font=("Arial", 10), anchor="center")
+        self.spending_label.pack(fill="x", padx=10, pady=(10, 0))
+        self.update_spending_summary()
+        self.create_search_bar()
+
+        self.transactions_view = TransactionListView(self.transactions_tab, self.transaction_icon,
+                                                     on_edge=self.on_history_edge)
+        self.transactions_view.pack(expand=True, fill="both", padx=10, pady=10)
 
-        if not hasattr(self, "transactions") or not self.transactions:
-            ttk.Label(frame, text="No transactions available", font=("Arial", 12)).pack(pady=20)
+        import_button = ttk.Button(
+            self.transactions_tab,
+            text="Import statement",
+            command=self.show_import_modal,
+            padding=(10, 5)
+        )
+        import_button.place(relx=0.85, rely=0.94, anchor="center")
+        recurring_button = ttk.Button(
+            self.transactions_tab,
+            text="Recurring",
+            command=self.show_recurring_modal,
+            padding=(10, 5)
+        )
+        recurring_button.place(relx=0.63, rely=0.94, anchor="center")
+        self.show_history()
+
+    def show_history(self):
+        # The list opens on the newest month and pages older months in (and
+        # newer ones back) as it nears either end, so its cost does not grow
+        # with the size of the ledger.
+        self.search_stream = None
+        self.history = self.ledger.history_months()
+        self.history_start = 0
+        self.history_sizes = []
+        self.transactions_view.top = 0
+        if not self.history:
+            self.transactions_view.set_rows([], {})
+            return
+        rows, headers = self.month_rows(self.history[0])
+        self.history_sizes.append(len(rows))
+        self.transactions_view.set_rows(rows, headers)
+
+    def month_rows(self, month):
+        year, number = month
+        month_str = f"{year:04d}-{number:02d}"
+        rows = [("month", month_str)]
+        headers = {month_str: self.month_header_text(year, number)}
+        for date_str, day_transactions, total_amount in self.ledger.month_groups(year, number):
+            headers[date_str] = self.day_header_text(date_str, total_amount)
+            rows.append(("header", date_str))
+            for trans in day_transactions:
+                rows.append(("transaction", date_str, trans))
+        return rows, headers
+
+    def on_history_edge(self, edge):
+        if self.search_stream is not None:
+            return
+        view = self.transactions_view
+        start = self.history_start
+        end = start + len(self.history_sizes)
+        first_visible, last_visible = view.visible_range()
+
+        if edge == "end" and end < len(self.history):
+            rows, headers = self.month_rows(self.history[end])
+            self.history_sizes.append(len(rows))
+            view.append_rows(rows, headers)
+            # Let go of the newest month once it is scrolled well out of view.
+            if len(self.history_sizes) > HISTORY_MONTHS and self.history_sizes[0] < first_visible:
+                view.drop_rows(self.history_sizes.pop(0), from_start=True)
+                self.history_start += 1
+        elif edge == "start" and start > 0:
+            rows, headers = self.month_rows(self.history[start - 1])
+            self.history_sizes.insert(0, len(rows))
+            self.history_start -= 1
+            view.prepend_rows(rows, headers)
+            first_visible, last_visible = view.visible_range()
+            if len(self.history_sizes) > HISTORY_MONTHS and len(view.rows) - self.history_sizes[-1] > last_visible:
+                view.drop_rows(self.history_sizes.pop(), from_start=False)
+
+    def month_header_text(self, year, month):
+        spent, earned = self.ledger.month_summary(year, month)
+        month_year = datetime(year, month, 1).strftime("%B %Y")
+        return f"{month_year} | Spent {format_money(spent)} | Earned {format_money(earned)}"
+
+    def create_search_bar(self):
+        bar = ttk.Frame(self.transactions_tab)
+        bar.pack(fill="x", padx=10, pady=(5, 0))
+        self.search_vars = {name: tk.StringVar() for name in ("text", "min", "max", "start", "end")}
+
+        ttk.Entry(bar, textvariable=self.search_vars["text"]).pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.search_account = ttk.Combobox(
+            bar, state="readonly", width=12,
+            postcommand=lambda: self.search_account.config(values=[ALL_ACCOUNTS] + self.ledger.accounts.names())
+        )
+        self.search_account.set(ALL_ACCOUNTS)
+        self.search_account.pack(side="left", padx=5)
+        self.search_category = ttk.Combobox(
+            bar, state="readonly", width=14,
+            postcommand=lambda: self.search_category.config(values=[ALL_CATEGORIES] + self.ledger.categories.names())
+        )
+        self.search_category.set(ALL_CATEGORIES)
+        self.search_category.pack(side="left", padx=5)
+        ttk.Button(bar, text="Clear", command=self.clear_search).pack(side="left", padx=(5, 0))
+
+        filters = ttk.Frame(self.transactions_tab)
+        filters.pack(fill="x", padx=10, pady=(5, 0))
+        # The amount range matches each transaction in its account's currency.
+        for label, name, width in (("Amount", "min", 8), ("to", "max", 8), ("From", "start", 10), ("To", "end", 10)):
+            ttk.Label(filters, text=label).pack(side="left", padx=(5, 2))
+            ttk.Entry(filters, textvariable=self.search_vars[name], width=width).pack(side="left")
+        self.search_status = ttk.Label(filters, font=("Arial", 9))
+        self.search_status.pack(side="right")
+
+        for var in self.search_vars.values():
+            var.trace_add("write", lambda *args: self.schedule_search())
+        for combobox in (self.search_account, self.search_category):
+            combobox.bind("<<ComboboxSelected>>", lambda e: self.schedule_search())
+
+    def clear_search(self):
+        for var in self.search_vars.values():
+            var.set("")
+        self.search_account.set(ALL_ACCOUNTS)
+        self.search_category.set(ALL_CATEGORIES)
+        self.schedule_search()
+
+    def schedule_search(self):
+        # Wait for a pause in typing rather than querying on every keystroke.
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def search_filters(self):
+        # Incomplete or invalid amounts and dates are ignored until they parse.
+        values = {name: var.get().strip() for name, var in self.search_vars.items()}
+        filters = {"text": values["text"]}
+        if self.search_account.get() != ALL_ACCOUNTS:
+            filters["account"] = self.search_account.get()
+        if self.search_category.get() != ALL_CATEGORIES:
+            filters["category"] = self.search_category.get()
+        for name, key in (("min", "min_amount"), ("max", "max_amount")):
+            try:
+                filters[key] = parse_money(values[name]) if values[name] else None
+            except ValueError:
+                filters[key] = None
+        for name in ("start", "end"):
+            try:
+                filters[name] = date.fromisoformat(values[name]) if values[name] else None
+            except ValueError:
+                filters[name] = None
+        return filters
+
+    def search_active(self):
+        return any(value for value in self.search_filters().values())
+
+    @traced("search.run")
+    def run_search(self):
+        self.search_after = None
+        filters = self.search_filters()
+        if not any(filters.values()):
+            self.search_status.config(text="")
+            self.show_history()
             return
 
-        sorted_transactions = sorted(self.transactions, key=lambda t: t["datetime"], reverse=True)
+        ids = self.ledger.search_transactions(**filters)
+        self.search_status.config(text=f"{len(ids):,} matches")
+        self.search_stream = stream = object()
+        self.transactions_view.top = 0
+        self.transactions_view.set_rows([], {})
+        self.stream_search_results(ids, 0, stream)
+
+    def stream_search_results(self, ids, position, stream):
+        # Results go into the list a chunk at a time so a broad match never
+        # blocks the main loop; a newer search abandons the old stream.
+        if stream is not self.search_stream:
+            return
+        view = self.transactions_view
+        rows = []
+        headers = {}
+        for trans in self.ledger.transactions_for_ids(ids[position:position + SEARCH_CHUNK]):
+            date_str = trans["datetime"][:10]
+            if date_str not in view.headers and date_str not in headers:
+                headers[date_str] = self.day_header_text(date_str, self.ledger.day_total(date_str))
+                rows.append(("header", date_str))
+            rows.append(("transaction", date_str, trans))
+        view.append_rows(rows, headers)
+
+        position += SEARCH_CHUNK
+        if position < len(ids):
+            self.root.after(1, self.stream_search_results, ids, position, stream)
+
+    def show_new_transaction(self, transaction):
+        if self.search_active():
+            # The new transaction may not match the filters; re-run the search instead.
+            self.update_spending_summary()
+            self.schedule_search()
+            return
+        date_str = transaction["datetime"].split()[0]
+        month = (int(date_str[:4]), int(date_str[5:7]))
+        loaded = self.history[self.history_start:self.history_start + len(self.history_sizes)]
+        self.update_spending_summary()
+        if month not in loaded:
+            # First transaction of a new month: reopen on the newest month if
+            # the list is showing the top of the history, else leave it be.
+            if self.history_start == 0 and (not loaded or month > loaded[0]):
+                self.show_history()
+            return
 
-        from collections import defaultdict
-        transactions_by_date = defaultdict(list)
-        for t in sorted_transactions:
-            date_str = t["datetime"].split()[0]
-            transactions_by_date[date_str].append(t)
+        view = self.transactions_view
+        view.headers[date_str[:7]] = self.month_header_text(*month)
+        header_text = self.day_header_text(date_str, self.ledger.day_total(date_str))
+        rows_before = len(view.rows)
+        view.insert_transaction(date_str, transaction, header_text)
+        self.history_sizes[loaded.index(month)] += len(view.rows) - rows_before
+
+    def update_spending_summary(self):
+        month, year = self.ledger.spending_summary()
+        self.spending_label.config(
+            text=f"Spent this month: {format_money(month)}   |   This year: {format_money(year)}"
+        )
 
-        sorted_dates = sorted(transactions_by_date.keys(), reverse=True)
+    def day_header_text(self, date_str, total_amount):
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        day = dt.strftime("%d")
+        weekday = dt.strftime("%A")
+        month_year = dt.strftime("%B %Y")
+        header_amount = format_day_total(total_amount)
+        return f"{day} | {weekday} {month_year} | {header_amount}"
 
-        for date_str in sorted_dates:
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-            day = dt.strftime("%d")
-            weekday = dt.strftime("%A")
-            month_year = dt.strftime("%B %Y")
+    def show_import_modal(self):
+        if self.import_job is not None:
+            return
+        path = filedialog.askopenfilename(
+            title="Import bank statement",
+            filetypes=[("Bank statements", "*.csv *.ofx *.qfx"), ("All files", "*.*")]
+        )
+        if not path:
+            return
 
-            equation = ""
-            for trans in transactions_by_date[date_str]:
-                amt_str = trans["amount"].replace("₱", "").replace(",", "").strip()
-                if not (amt_str.startswith('+') or amt_str.startswith('-')):
-                    amt_str = "+" + amt_str
-                equation += amt_str
+        import_window = tk.Toplevel(self.root)
+        import_window.title("Import into Account")
+        self.open_centered_window(import_window, 200, 200)
 
-            print("DEBUG: Equation for date", date_str, ":", equation)
+        frame = ttk.Frame(import_window)
+        frame.pack(expand=True, fill="both", padx=10, pady=10)
+        for account in self.ledger.accounts.names():
+            btn = ttk.Button(frame, text=account,
+                             command=lambda a=account: self.start_import(path, a, import_window))
+            btn.pack(fill="x", padx=5, pady=5)
 
+    def start_import(self, path, account, window):
+        window.destroy()
+        self.import_job = ImportJob(self.ledger.store.path, path, self.ledger.accounts.ids_by_name,
+                                    self.ledger.categories.name_table(), account)
+
+        self.import_frame = ttk.Frame(self.transactions_tab)
+        self.import_frame.pack(fill="x", padx=10, before=self.transactions_view)
+        self.import_label = ttk.Label(self.import_frame, text="Importing...", font=("Arial", 10))
+        self.import_label.pack(side="left", padx=5)
+        ttk.Button(self.import_frame, text="Cancel", command=self.import_job.cancel).pack(side="right", padx=5)
+        self.import_bar = ttk.Progressbar(self.import_frame, maximum=1.0)
+        self.import_bar.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.import_job.start()
+        self.root.after(100, self.poll_import)
+
+    def poll_import(self):
+        finished = None
+        while True:
             try:
-                total_amount = eval(equation)
-            except Exception as e:
-                print("DEBUG: Error evaluating equation for date", date_str, ":", e)
-                total_amount = 0.0
-
-            if total_amount > 0:
-                header_amount = f"+₱{total_amount:,.2f}"
-            elif total_amount < 0:
-                header_amount = f"-₱{abs(total_amount):,.2f}"
+                event, value, fraction = self.import_job.events.get_nowait()
+            except queue.Empty:
+                break
+            if event == "progress":
+                self.import_label.config(text=f"Imported {value:,}")
+                self.import_bar["value"] = fraction
             else:
-                header_amount = f"₱{total_amount:,.2f}"
-
-            header_text = f"{day} | {weekday} {month_year} | {header_amount}"
-            header_label = ttk.Label(frame, text=header_text, font=("Arial", 10, "bold"), anchor="center")
-            header_label.pack(fill="x", pady=(10, 5))
+                finished = (event, value)
 
-            ttk.Separator(frame, orient="horizontal").pack(fill="x", pady=5)
-
-            for trans in transactions_by_date[date_str]:
-                row_frame = ttk.Frame(frame)
-                row_frame.pack(fill="x", pady=5)
-
-                icon_path = "icons/placeholder.png"
-                if hasattr(self, "categories"):
-                    all_categories = []
-                    for section in self.categories.values():
-                        all_categories.extend(section)
-                    for cat in all_categories:
-                        if cat["name"] == trans["category"]:
-                            icon_path = cat["icon"]
-                            break
+        if finished is None:
+            self.root.after(100, self.poll_import)
+            return
 
-                try:
-                    icon_img = Image.open(icon_path).resize((30, 30), Image.LANCZOS)
-                    icon_photo = ImageTk.PhotoImage(icon_img)
-                except Exception:
-                    icon_photo = None
-
-                if icon_photo:
-                    icon_label = ttk.Label(row_frame, image=icon_photo)
-                    icon_label.image = icon_photo  # keep a reference
-                    icon_label.pack(side="left", padx=5)
-                else:
-                    ttk.Label(row_frame, text="[icon]").pack(side="left", padx=5)
+        # The worker wrote through its own connection; pick up its balances
+        # and rebuild the Transactions tab once.
+        self.import_job = None
+        self.ledger.refresh_balances()
+        for account in self.ledger.accounts.values():
+            self.update_account_balance(account)
+        self.ledger.load_transactions()
+        self.create_transactions_tab()
+        self.refresh_budget_bars()
 
-                details = f"{trans['category']} \n{trans['account']}"
-                if trans["notes"]:
-                    details += f"\n{trans['notes']}"
-                details_label = ttk.Label(row_frame, text=details, font=("Arial", 10))
-                details_label.pack(side="left", padx=5, fill="x", expand=True)
+        event, value = finished
+        if event == "error":
+            messagebox.showerror("Import Failed", value)
+            return
+        imported, skipped, uncategorized = value
+        message = f"Imported {imported:,} transactions."
+        if uncategorized:
+            message += f"\n{uncategorized:,} had no matching category and were filed as {UNCATEGORIZED}."
+        if skipped:
+            message += f"\nSkipped {skipped:,} rows without a usable date or amount."
+        if event == "cancelled":
+            messagebox.showwarning("Import Cancelled", f"{message}\nThe rows imported before the cancel were kept.")
+        else:
+            messagebox.showinfo("Import Complete", message)
 
-                amount_label = ttk.Label(row_frame, text=trans["amount"], font=("Arial", 10, "bold"))
-                amount_label.pack(side="right", padx=5)
+    def refresh_transactions(self):
+        # One redraw after a batch of new transactions.
+        self.update_spending_summary()
+        if self.search_active():
+            self.schedule_search()
+        else:
+            self.show_history()
 
-                ttk.Separator(frame, orient="horizontal").pack(fill="x", pady=5)
+    def transaction_icon(self, trans):
+        icon_path = self.ledger.categories.icon(trans["category_id"])
+        return icon_cache.get(icon_path, (30, 30), fallback=None)
 
     def close_modal(self):
+        self.on_account_selected = None
         if self.modal is not None:
             self.modal.destroy()
             self.modal = None
@@ -844,10 +1197,152 @@ class BudgetTracker:
             self.overlay.destroy()
             self.overlay = None
 
+    """RECURRING"""
+
+    def schedule_recurring(self):
+        # A single timer serves every rule: it sleeps until the earliest due
+        # time instead of each rule polling on its own.
+        if self.recurring_after is not None:
+            self.root.after_cancel(self.recurring_after)
+            self.recurring_after = None
+        due = self.ledger.recurring.peek()
+        if due is None:
+            return
+        delay = int((parse_time(due) - datetime.now()).total_seconds() * 1000)
+        self.recurring_after = self.root.after(min(max(delay, 0), RECURRING_CHECK_MS), self.run_recurring)
 
-root = tk.Tk()
-app = BudgetTracker(root)
-root.mainloop()
+    def run_recurring(self):
+        self.recurring_after = None
+        transactions, accounts = self.ledger.post_due_recurring()
+        for account in accounts:
+            self.update_account_balance(account)
+        if transactions:
+            self.refresh_transactions()
+            self.refresh_budget_bars()
+        self.schedule_recurring()
+
+    def show_recurring_modal(self):
+        window = tk.Toplevel(self.root)
+        window.title("Recurring Transactions")
+        self.open_centered_window(window, 460, 260)
+
+        columns = ("Category", "Account", "Amount", "Every", "Next")
+        tree = ttk.Treeview(window, columns=columns, show="headings", height=8)
+        for column, width in zip(columns, (100, 90, 80, 80, 110)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor="e" if column == "Amount" else "w")
+        tree.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        def fill():
+            tree.delete(*tree.get_children())
+            for rule in sorted(self.ledger.recurring.values(), key=lambda rule: rule["next_due"]):
+                account = self.ledger.accounts.by_id.get(rule["account_id"])
+                category = self.ledger.categories.by_id.get(rule["category_id"])
+                tree.insert("", tk.END, iid=str(rule["id"]), values=(
+                    category["name"] if category else "(removed)",
+                    account["name"] if account else "(removed)",
+                    format_day_total(rule["amount"], self.ledger.account_currency(rule["account_id"])),
+                    f"{rule['interval']} {REPEAT_UNITS[rule['frequency']]}",
+                    rule["next_due"][:16]))
+
+        def delete_selected():
+            for item in tree.selection():
+                self.ledger.delete_recurring(int(item))
+            fill()
+            self.schedule_recurring()
+
+        ttk.Button(window, text="Delete", command=delete_selected).pack(side="right", padx=10, pady=(0, 10))
+        fill()
+
+    """REPORTS"""
+
+    def create_reports_tab(self):
+        controls = ttk.Frame(self.reports_tab)
+        controls.pack(fill="x", padx=10, pady=(10, 0))
+
+        self.report_year = ttk.Combobox(controls, state="readonly", width=8)
+        self.report_year.pack(side="left", padx=5)
+        self.report_view = ttk.Combobox(controls, state="readonly", values=list(REPORT_VIEWS), width=22)
+        self.report_view.current(0)
+        self.report_view.pack(side="left", padx=5)
+        for combobox in (self.report_year, self.report_view):
+            combobox.bind("<<ComboboxSelected>>", lambda e: self.refresh_reports())
+
+        frame = ttk.Frame(self.reports_tab)
+        frame.pack(expand=True, fill="both", padx=10, pady=10)
+
+        months = [datetime(2000, month, 1).strftime("%b") for month in range(1, 13)]
+        columns = ("Name", *months, "Total")
+        self.reports_tree = ttk.Treeview(frame, columns=columns, show="headings")
+        for column in columns:
+            self.reports_tree.heading(column, text=column, anchor="w" if column == "Name" else "e")
+            self.reports_tree.column(column, width=110 if column == "Name" else 80,
+                                     anchor="w" if column == "Name" else "e", stretch=False)
+
+        x_scroll = ttk.Scrollbar(frame, orient="horizontal", command=self.reports_tree.xview)
+        self.reports_tree.configure(xscrollcommand=x_scroll.set)
+        x_scroll.pack(side="bottom", fill="x")
+        self.reports_tree.pack(expand=True, fill="both")
+
+        self.reports_top_label = ttk.Label(self.reports_tab, font=("Arial", 10), anchor="w")
+        self.reports_top_label.pack(fill="x", padx=10, pady=(0, 10))
+
+    @traced("reports.refresh")
+    def refresh_reports(self):
+        years = sorted({year for year, month in self.ledger.totals.months}, reverse=True) or [datetime.now().year]
+        self.report_year["values"] = years
+        if self.report_year.get() not in [str(year) for year in years]:
+            self.report_year.set(years[0])
+        year = int(self.report_year.get())
+        group, kind = REPORT_VIEWS[self.report_view.get()]
+
+        if group == "category":
+            names = {category["id"]: category["name"] for category in self.ledger.categories.values()}
+            # The columns hold 0 for transactions without a category.
+            names[0] = UNCATEGORIZED
+        else:
+            names = {account["id"]: account["name"] for account in self.ledger.accounts.values()}
+        amount_text = format_day_total if kind is None else format_pesos
+
+        self.refresh_rates()
+        reports = self.ledger.reports
+        pivot = reports.pivot(group, (year, 1), (year, 12), kind)
+        totals = reports.totals(group, (year, 1), (year, 12), kind)
+
+        self.reports_tree.delete(*self.reports_tree.get_children())
+        for key, total in sorted(totals.items(), key=lambda item: abs(item[1]), reverse=True):
+            cells = [pivot[(year, month)].get(key) for month in range(1, 13)]
+            self.reports_tree.insert("", tk.END, values=(
+                names.get(key, "(removed)"),
+                *["" if cell is None else amount_text(cell) for cell in cells],
+                amount_text(total)
+            ))
+
+        top = reports.top(group, 3, (year, 1), (year, 12), kind)
+        text = ("Top: " + "   |   ".join(f"{names.get(key, '(removed)')} {amount_text(total)}" for key, total in top)
+                if top else "No transactions in this year.")
+        missing = self.ledger.missing_rates()
+        if missing:
+            text += f"   (no rate for {', '.join(missing)}; left out)"
+        self.reports_top_label.config(text=text)
+
+
+def main():
+    ledger = Ledger(LedgerStore())
+    ledger.load()
+    root = tk.Tk()
+    app = BudgetTracker(root, ledger)
+    if tracer.enabled:
+        Heartbeat(root, tracer).start()
+    root.mainloop()
+    app.workers.shutdown()
+    ledger.save_snapshot()
+    ledger.store.close()
+    tracer.write()
+
+
+if __name__ == "__main__":
+    main()
 
 
 """
@@ -0,0 +1,64 @@
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Money is held as an int number of centavos everywhere except on screen.
+# Other currencies are held in hundredths of their unit the same way.
+BASE_CURRENCY = "PHP"
+CURRENCY_SYMBOLS = {"PHP": "₱", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "SGD": "S$", "AUD": "A$"}
+CURRENCY_CODE = re.compile(r"^[A-Za-z]{3}\s*")
+
+
+def currency_symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+
+
+def parse_money(text):
+    text = str(text).replace(",", "").strip()
+    # Any account's symbol (longest first, so "S$" before "$") or a bare
+    # currency code may lead the number.
+    for symbol in sorted(CURRENCY_SYMBOLS.values(), key=len, reverse=True):
+        if symbol in text:
+            text = text.replace(symbol, "", 1)
+            break
+    text = CURRENCY_CODE.sub("", text)
+    try:
+        value = Decimal(text.strip())
+        return int((value * 100).to_integral_value(ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, OverflowError):
+        raise ValueError(f"Invalid amount: {text!r}")
+
+
+def format_pesos(centavos):
+    pesos, cents = divmod(abs(centavos), 100)
+    return f"{pesos:,}.{cents:02d}"
+
+
+def format_plain(centavos):
+    pesos, cents = divmod(abs(centavos), 100)
+    sign = "-" if centavos < 0 else ""
+    return f"{sign}{pesos}.{cents:02d}"
+
+
+def format_money(centavos, currency=BASE_CURRENCY):
+    sign = "-" if centavos < 0 else ""
+    return f"{sign}{currency_symbol(currency)}{format_pesos(centavos)}"
+
+
+def format_balance(centavos, currency=BASE_CURRENCY):
+    sign = "-" if centavos < 0 else ""
+    return f"{currency_symbol(currency)} {sign}{format_pesos(centavos)}"
+
+
+def format_amount(centavos, currency=BASE_CURRENCY):
+    if centavos >= 0:
+        return f"+ {currency_symbol(currency)}{format_pesos(centavos)}"
+    return f"- {currency_symbol(currency)}{format_pesos(centavos)}"
+
+
+def format_day_total(centavos, currency=BASE_CURRENCY):
+    symbol = currency_symbol(currency)
+    if centavos > 0:
+        return f"+{symbol}{format_pesos(centavos)}"
+    elif centavos < 0:
+        return f"-{symbol}{format_pesos(centavos)}"
+    return f"{symbol}{format_pesos(centavos)}"
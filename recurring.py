@@ -0,0 +1,101 @@
+import calendar
+import heapq
+from datetime import datetime, timedelta
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# "custom" repeats every `interval` days; the others every `interval` days, weeks or months.
+FREQUENCIES = ("daily", "weekly", "monthly", "custom")
+FREQUENCY_DAYS = {"daily": 1, "weekly": 7, "custom": 1}
+
+
+def parse_time(text):
+    return datetime.fromisoformat(text)
+
+
+def format_time(when):
+    # Same text as strftime(TIME_FORMAT), several times faster, which shows
+    # when catching up months of many daily rules.
+    return when.isoformat(" ", "seconds")
+
+
+def add_months(when, months, day):
+    # Same day of the month, clamped to the month's length: a rule started
+    # on the 31st lands on the 30th or the 28th and goes back to the 31st.
+    month = when.month - 1 + months
+    year = when.year + month // 12
+    month = month % 12 + 1
+    return when.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, when):
+    if rule["frequency"] == "monthly":
+        return add_months(when, rule["interval"], parse_time(rule["start"]).day)
+    return when + timedelta(days=FREQUENCY_DAYS[rule["frequency"]] * rule["interval"])
+
+
+class RecurringScheduler:
+    # Every rule sits in one min-heap keyed by its next due time, so what is
+    # due next is a peek at the root and a single Tk timer serves all rules.
+    # Removing or rescheduling a rule leaves its old heap entry behind; stale
+    # entries are dropped when they surface.
+    def __init__(self):
+        self.rules = {}
+        self.heap = []
+
+    def add(self, rule):
+        self.rules[rule["id"]] = rule
+        heapq.heappush(self.heap, (rule["next_due"], rule["id"]))
+        return rule
+
+    def remove(self, rule_id):
+        return self.rules.pop(rule_id, None)
+
+    def peek(self):
+        # The earliest next due time, or None when there are no rules.
+        while self.heap:
+            due, rule_id = self.heap[0]
+            rule = self.rules.get(rule_id)
+            if rule is not None and rule["next_due"] == due:
+                return due
+            heapq.heappop(self.heap)
+        return None
+
+    def due(self, now):
+        # Pops every rule due at or before now. Returns the occurrences as
+        # (rule, datetime text) oldest first, and each popped rule's new due
+        # time; nothing is rescheduled until reschedule() is called with them.
+        limit = format_time(now)
+        occurrences = []
+        next_due = {}
+        while True:
+            due = self.peek()
+            if due is None or due > limit:
+                break
+            rule_id = heapq.heappop(self.heap)[1]
+            rule = self.rules[rule_id]
+            when = parse_time(due)
+            if rule["frequency"] == "monthly":
+                while when <= now:
+                    occurrences.append((rule, format_time(when)))
+                    when = next_occurrence(rule, when)
+            else:
+                step = timedelta(days=FREQUENCY_DAYS[rule["frequency"]] * rule["interval"])
+                while when <= now:
+                    occurrences.append((rule, when.isoformat(" ", "seconds")))
+                    when += step
+            next_due[rule_id] = format_time(when)
+        occurrences.sort(key=lambda occurrence: occurrence[1])
+        return occurrences, next_due
+
+    def reschedule(self, next_due):
+        for rule_id, due in next_due.items():
+            rule = self.rules.get(rule_id)
+            if rule is not None:
+                rule["next_due"] = due
+                heapq.heappush(self.heap, (due, rule_id))
+
+    def values(self):
+        return self.rules.values()
+
+    def __len__(self):
+        return len(self.rules)
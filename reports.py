@@ -0,0 +1,113 @@
+from datetime import date
+
+from tracing import traced
+
+REPORT_GROUPS = ("category", "account")
+REPORT_KINDS = (None, "expenses", "income")
+REPORT_VIEWS = {
+    "Spending by category": ("category", "expenses"),
+    "Income by category": ("category", "income"),
+    "Spending by account": ("account", "expenses"),
+    "Net by account": ("account", None),
+}
+
+
+def month_of(datetime_text):
+    return int(datetime_text[:4]), int(datetime_text[5:7])
+
+
+def next_month(month):
+    year, number = month
+    return (year + 1, 1) if number == 12 else (year, number + 1)
+
+
+def months_between(first, last):
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+class ReportEngine:
+    # Category x month and account x month pivots over TransactionColumns.
+    # Results are cached one month at a time per (group, kind), so a new or
+    # deleted transaction only drops the cells for its own month; ranged
+    # results (top N) are cached per range and dropped when a touched month
+    # falls inside it. kind is "expenses", "income" or None for net.
+    # With a converter (ledgers holding several currencies) each month is
+    # also split by account, and the converter folds those sums into base
+    # currency cells, a currency at a time.
+    def __init__(self, columns, converter=None):
+        self.columns = columns
+        self.converter = converter
+        self.cells = {}
+        self.ranges = {}
+        self.hits = 0
+        self.misses = 0
+
+    def pivot(self, group, first, last, kind=None):
+        # {(year, month): {id: centavos}} for every month from first to last.
+        months = months_between(first, last)
+        missing = [month for month in months if (group, kind, month) not in self.cells]
+        self.hits += len(months) - len(missing)
+        if missing:
+            self.misses += len(missing)
+            self.fill(group, kind, missing)
+        return {month: self.cells[(group, kind, month)] for month in months}
+
+    @traced("reports.aggregate")
+    def fill(self, group, kind, months):
+        # One vectorized pass over the span of the missing months.
+        start = date(*months[0], 1)
+        end = date(*next_month(months[-1]), 1)
+        for month in months:
+            self.cells[(group, kind, month)] = {}
+        if self.converter is None:
+            sums = self.columns.sum_by_pair("month", group, start, end, kind)
+        elif group == "account":
+            sums = self.converter({(month, key, key): total for (month, key), total
+                                   in self.columns.sum_by_pair("month", group, start, end, kind).items()})
+        else:
+            sums = self.converter(self.columns.sum_by_groups(("month", group, "account"), start, end, kind))
+        for (month, key), total in sums.items():
+            cell = self.cells.get((group, kind, month))
+            if cell is not None:
+                cell[key] = total
+
+    def totals(self, group, first, last, kind=None):
+        totals = {}
+        for cell in self.pivot(group, first, last, kind).values():
+            for key, total in cell.items():
+                totals[key] = totals.get(key, 0) + total
+        return totals
+
+    def top(self, group, n, first, last, kind="expenses"):
+        key = ("top", group, kind, n, first, last)
+        result = self.ranges.get(key)
+        if result is None:
+            totals = self.totals(group, first, last, kind)
+            result = sorted(totals.items(), key=lambda item: abs(item[1]), reverse=True)[:n]
+            self.ranges[key] = result
+        return result
+
+    def invalidate(self, datetime_text):
+        month = month_of(datetime_text)
+        for group in REPORT_GROUPS:
+            for kind in REPORT_KINDS:
+                self.cells.pop((group, kind, month), None)
+        if self.ranges:
+            self.ranges = {key: result for key, result in self.ranges.items() if not key[-2] <= month <= key[-1]}
+
+    def set_converter(self, converter):
+        if converter != self.converter:
+            self.converter = converter
+            self.clear()
+
+    def clear(self):
+        self.cells.clear()
+        self.ranges.clear()
+
+    def stats(self):
+        return {"cells": len(self.cells), "ranges": len(self.ranges), "hits": self.hits, "misses": self.misses}
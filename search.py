@@ -0,0 +1,109 @@
+import re
+from bisect import bisect_left, insort
+
+from tracing import traced
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    # Every distinct notes text gets a note id, which TransactionColumns
+    # stores per transaction. The inverted index maps lower-cased words to
+    # note ids, so a text query becomes a (usually small) set of note ids
+    # and is applied in the same vectorized pass as the account, category,
+    # amount and date filters. The word list is kept sorted so each query
+    # word also matches as a prefix ("groc" finds "groceries"). After a
+    # snapshot restore the word index is rebuilt on the first text query.
+    def __init__(self, columns):
+        self.columns = columns
+        self.note_ids = {}
+        self.note_counts = {}
+        self.postings = {}
+        self.words = []
+        self.next_note_id = 1
+
+    def add(self, transaction):
+        # Returns the note id to store in the columns.
+        notes = transaction["notes"]
+        note_id = self.note_ids.get(notes)
+        if note_id is None:
+            note_id = self.note_ids[notes] = self.next_note_id
+            self.next_note_id += 1
+            self.note_counts[note_id] = 0
+            if self.postings is not None:
+                for word in set(tokenize(notes)):
+                    note_ids = self.postings.get(word)
+                    if note_ids is None:
+                        note_ids = self.postings[word] = set()
+                        insort(self.words, word)
+                    note_ids.add(note_id)
+        self.note_counts[note_id] += 1
+        return note_id
+
+    def remove(self, transaction):
+        notes = transaction["notes"]
+        note_id = self.note_ids.get(notes)
+        if note_id is None:
+            return
+        self.note_counts[note_id] -= 1
+        if self.note_counts[note_id]:
+            return
+        del self.note_counts[note_id]
+        del self.note_ids[notes]
+        if self.postings is None:
+            return
+        for word in set(tokenize(notes)):
+            note_ids = self.postings[word]
+            note_ids.discard(note_id)
+            if not note_ids:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def restore_notes(self, note_ids, note_counts, next_note_id):
+        self.note_ids = note_ids
+        self.note_counts = note_counts
+        self.next_note_id = next_note_id
+        self.postings = None
+        self.words = []
+
+    def build_postings(self):
+        postings = {}
+        for notes, note_id in self.note_ids.items():
+            for word in set(tokenize(notes)):
+                postings.setdefault(word, set()).add(note_id)
+        self.postings = postings
+        self.words = sorted(postings)
+
+    def prefix_notes(self, prefix):
+        note_ids = set()
+        i = bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            note_ids |= self.postings[self.words[i]]
+            i += 1
+        return note_ids
+
+    def match_text(self, text):
+        if self.postings is None:
+            self.build_postings()
+        note_ids = None
+        for word in sorted(set(tokenize(text)), key=len, reverse=True):
+            matches = self.prefix_notes(word)
+            note_ids = matches if note_ids is None else note_ids & matches
+            if not note_ids:
+                break
+        return note_ids
+
+    @traced("search.query")
+    def query(self, text="", account_id=None, category_id=None, min_amount=None, max_amount=None,
+              start=None, end=None):
+        # Matching transaction ids, newest first. start is inclusive and end
+        # exclusive, as for TransactionColumns.
+        note_ids = self.match_text(text) if tokenize(text) else None
+        if note_ids is not None and not note_ids:
+            return []
+        return self.columns.select_ids(start=start, end=end, account_id=account_id, category_id=category_id,
+                                       min_amount=min_amount, max_amount=max_amount, note_ids=note_ids)
@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from datetime import date, datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from aggregates import MAX_DATE, MIN_DATE, check_date
+from ledger import MAX_CENTAVOS, Ledger
+from money import format_plain, parse_money
+from recurring import format_time
+from reports import REPORT_GROUPS
+from storage import DB_PATH, LedgerStore
+from tracing import timer, tracer
+
+# A headless HTTP/1.1 JSON API over one Ledger, on TCP or a Unix socket.
+# Everything runs on the event loop thread, which owns the ledger and its
+# SQLite connection. Reads are answered straight from the in-memory indexes.
+# Writes go through one queue drained by a single writer task, so balance
+# updates never interleave; posts that are queued together (concurrent
+# clients, or a list in one request) are written in one commit. Run it
+# instead of the window, not next to it: each keeps its own copy of the
+# balances.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+IDLE_TIMEOUT_S = 30
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_BATCH_JOBS = 256
+MAX_PAGE = 1000
+MAX_REPORT_MONTHS = 120
+RECURRING_CHECK_S = 60
+KIND_NAMES = {"expenses": "expenses", "income": "income", "net": None}
+
+
+class ApiError(ValueError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+"""JSON"""
+
+
+def account_json(account):
+    return {"id": account["id"], "type": account["type"], "name": account["name"],
+            "balance": format_plain(account["balance"]), "currency": account["currency"]}
+
+
+def category_json(category):
+    budget = category["budget"]
+    return {"id": category["id"], "kind": category["kind"], "name": category["name"],
+            "archived": category["archived"], "budget": format_plain(budget) if budget is not None else None}
+
+
+def transaction_json(transaction):
+    return {"id": transaction["id"], "datetime": transaction["datetime"], "account": transaction["account"],
+            "category": transaction["category"], "category_id": transaction["category_id"],
+            "amount": format_plain(transaction["amount"]), "currency": transaction["currency"],
+            "notes": transaction["notes"]}
+
+
+def month_text(month):
+    return f"{month[0]:04d}-{month[1]:02d}"
+
+
+def parse_month(text):
+    try:
+        year, month = (int(part) for part in text.split("-"))
+    except ValueError:
+        raise ApiError(400, f"Invalid month: {text!r}")
+    if not 1 <= month <= 12:
+        raise ApiError(400, f"Invalid month: {text!r}")
+    return year, month
+
+
+def parse_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise ApiError(400, f"Invalid date: {text!r}")
+
+
+def parse_amount(text):
+    try:
+        return parse_money(text)
+    except ValueError as error:
+        raise ApiError(400, str(error))
+
+
+def parse_int(text, name):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Invalid {name}: {text!r}")
+
+
+"""HTTP"""
+
+
+async def read_request(reader):
+    # (method, path, query, body, keep_alive), or None once the client is gone or idle.
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_S)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ApiError(431, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise ApiError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+    if "transfer-encoding" in headers:
+        raise ApiError(411, "Send a Content-Length instead of chunked bodies")
+    length = parse_int(headers.get("content-length", "0"), "Content-Length")
+    if length < 0 or length > MAX_BODY_BYTES:
+        raise ApiError(413, "Request body too large")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return method.upper(), url.path.rstrip("/") or "/", query, body, keep_alive
+
+
+def encode_response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+"""SERVER"""
+
+
+class ApiServer:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.writes = None
+        self.clients = {}
+        self.routes = {
+            ("GET", "/accounts"): self.get_accounts,
+            ("GET", "/categories"): self.get_categories,
+            ("GET", "/transactions"): self.get_transactions,
+            ("POST", "/transactions"): self.post_transactions,
+            ("GET", "/reports"): self.get_reports,
+            ("GET", "/summary"): self.get_summary,
+        }
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        self.writes = asyncio.Queue()
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        writer = asyncio.create_task(self.write_loop())
+        recurring = asyncio.create_task(self.recurring_loop())
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # No signal handlers on Windows; Ctrl+C still ends asyncio.run().
+                pass
+        address = unix_path or "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+        print(f"Serving the ledger on {address}", file=sys.stderr)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            recurring.cancel()
+            # Let queued writes finish before the ledger is saved and closed,
+            # then hang up on idle keep-alive connections.
+            await self.writes.join()
+            writer.cancel()
+            for client in self.clients.values():
+                client.close()
+            await asyncio.gather(*self.clients, return_exceptions=True)
+
+    async def handle_client(self, reader, writer):
+        # One connection serves requests until the client closes it, asks to,
+        # or stays idle past IDLE_TIMEOUT_S.
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, query, body, keep_alive = request
+                    with timer("api.request"):
+                        status, payload = await self.dispatch(method, path, query, body)
+                except ApiError as error:
+                    status, payload = error.status, {"error": str(error)}
+                except Exception as error:
+                    # A store failure answers this request; the server keeps going.
+                    print(f"api: request failed: {error!r}", file=sys.stderr)
+                    status, payload = 500, {"error": "Internal error"}
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            del self.clients[task]
+            writer.close()
+
+    async def dispatch(self, method, path, query, body):
+        route = self.routes.get((method, path))
+        if route is not None:
+            return await route(query, body)
+        if path.startswith("/transactions/"):
+            if method != "DELETE":
+                raise ApiError(405, f"{method} not allowed on {path}")
+            return await self.delete_transaction(parse_int(path.rsplit("/", 1)[1], "transaction id"))
+        if any(path == route_path for _, route_path in self.routes):
+            raise ApiError(405, f"{method} not allowed on {path}")
+        raise ApiError(404, f"No such resource: {path}")
+
+    async def write(self, action, payload=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((action, payload, future))
+        return await future
+
+    """READS"""
+
+    async def get_accounts(self, query, body):
+        return 200, {"accounts": [account_json(account) for account in self.ledger.accounts.values()]}
+
+    async def get_categories(self, query, body):
+        archived = query.get("archived") in ("1", "true")
+        return 200, {"categories": [category_json(category) for category in self.ledger.categories.values()
+                                    if archived or not category["archived"]]}
+
+    async def get_transactions(self, query, body):
+        # Newest first, filtered as in the search bar. limit and offset page
+        # through the matches; total is the number of matches.
+        filters = {"text": query.get("text", "")}
+        for name in ("account", "category"):
+            if query.get(name):
+                filters[name] = query[name]
+        for name, key in (("min", "min_amount"), ("max", "max_amount")):
+            if query.get(name):
+                filters[key] = parse_amount(query[name])
+        for name, key in (("from", "start"), ("to", "end")):
+            if query.get(name):
+                filters[key] = parse_date(query[name])
+        limit = min(max(parse_int(query.get("limit", "100"), "limit"), 0), MAX_PAGE)
+        offset = max(parse_int(query.get("offset", "0"), "offset"), 0)
+        ids = self.ledger.search_transactions(**filters)
+        transactions = self.ledger.transactions_for_ids(ids[offset:offset + limit])
+        return 200, {"total": len(ids), "transactions": [transaction_json(t) for t in transactions]}
+
+    async def get_reports(self, query, body):
+        # Per-month totals by category or account, from the report cache.
+        group = query.get("group", "category")
+        if group not in REPORT_GROUPS:
+            raise ApiError(400, f"group must be one of {', '.join(REPORT_GROUPS)}")
+        kind_name = query.get("kind", "expenses")
+        if kind_name not in KIND_NAMES:
+            raise ApiError(400, f"kind must be one of {', '.join(KIND_NAMES)}")
+        today = date.today()
+        first = parse_month(query["from"]) if query.get("from") else (today.year, 1)
+        last = parse_month(query["to"]) if query.get("to") else (today.year, today.month)
+        if first > last:
+            raise ApiError(400, "from is after to")
+        if (last[0] - first[0]) * 12 + last[1] - first[1] >= MAX_REPORT_MONTHS:
+            raise ApiError(400, "Range is too long")
+
+        self.ledger.refresh_rates()
+        registry = self.ledger.categories if group == "category" else self.ledger.accounts
+        pivot = self.ledger.reports.pivot(group, first, last, KIND_NAMES[kind_name])
+        months = []
+        for month, cell in pivot.items():
+            months.append({"month": month_text(month), "totals": [
+                {"id": key, "name": registry.by_id[key]["name"] if key in registry.by_id else None,
+                 "amount": format_plain(total)}
+                for key, total in sorted(cell.items(), key=lambda item: item[1])
+            ]})
+        return 200, {"group": group, "kind": kind_name, "months": months,
+                     "missing_rates": self.ledger.missing_rates()}
+
+    async def get_summary(self, query, body):
+        self.ledger.refresh_rates()
+        month, year = self.ledger.spending_summary()
+        return 200, {
+            "spent_this_month": format_plain(month),
+            "spent_this_year": format_plain(year),
+            "net_worth": format_plain(self.ledger.net_worth()),
+            "missing_rates": self.ledger.missing_rates(),
+            "budgets": [{"category": category["name"], "spent": format_plain(spent), "budget": format_plain(budget)}
+                        for category, spent, budget in self.ledger.budget_status()],
+        }
+
+    """WRITES"""
+
+    async def post_transactions(self, query, body):
+        # One transaction object, or a list of them for a bulk post. amount is
+        # positive; the category's kind gives the sign as in the window.
+        try:
+            items = json.loads(body or b"null")
+        except ValueError:
+            raise ApiError(400, "Body is not valid JSON")
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            raise ApiError(400, "Send a transaction object or a non-empty list of them")
+        transactions, accounts = await self.write("post", items)
+        return 201, {"transactions": [transaction_json(t) for t in transactions],
+                     "accounts": [account_json(account) for account in accounts]}
+
+    async def delete_transaction(self, transaction_id):
+        transaction, account = await self.write("delete", transaction_id)
+        return 200, {"deleted": transaction_json(transaction),
+                     "account": account_json(account) if account is not None else None}
+
+    async def recurring_loop(self):
+        while True:
+            due = self.ledger.recurring.peek()
+            if due is not None and due <= format_time(datetime.now()):
+                try:
+                    await self.write("recurring")
+                except Exception as error:
+                    print(f"api: recurring post failed: {error!r}", file=sys.stderr)
+            await asyncio.sleep(RECURRING_CHECK_S)
+
+    async def write_loop(self):
+        # The only place the ledger is written. Each wake-up takes every job
+        # queued so far (up to MAX_BATCH_JOBS); consecutive posts share a commit.
+        while True:
+            jobs = [await self.writes.get()]
+            while len(jobs) < MAX_BATCH_JOBS and not self.writes.empty():
+                jobs.append(self.writes.get_nowait())
+            with timer("api.write_batch"):
+                posts = []
+                for job in jobs:
+                    if job[0] == "post":
+                        posts.append(job)
+                        continue
+                    self.run_posts(posts)
+                    posts = []
+                    self.run_job(*job)
+                self.run_posts(posts)
+            for _ in jobs:
+                self.writes.task_done()
+
+    def run_posts(self, jobs):
+        # Each job's items become transactions; a job with a bad item fails
+        # alone and the rest are written together.
+        batch = []
+        for _, items, future in jobs:
+            try:
+                batch.append((future, [self.make_transaction(item) for item in items]))
+            except ApiError as error:
+                future.set_exception(error)
+        if not batch:
+            return
+        try:
+            accounts = self.ledger.post_transactions([t for _, transactions in batch for t in transactions])
+        except Exception as error:
+            for future, _ in batch:
+                future.set_exception(error)
+            return
+        by_id = {account["id"]: account for account in accounts}
+        for future, transactions in batch:
+            account_ids = dict.fromkeys(t["account_id"] for t in transactions)
+            future.set_result((transactions, [by_id[account_id] for account_id in account_ids]))
+
+    def run_job(self, action, payload, future):
+        try:
+            if action == "delete":
+                rows = self.ledger.transactions_for_ids([payload])
+                if not rows:
+                    raise ApiError(404, f"No transaction {payload}")
+                transaction = rows[0]
+                self.ledger.delete_transaction(transaction)
+                result = transaction, self.ledger.accounts.by_id.get(transaction["account_id"])
+            else:
+                result = self.ledger.post_due_recurring()
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def make_transaction(self, item):
+        ledger = self.ledger
+        account = item.get("account")
+        if not isinstance(account, str) or ledger.accounts.id_for(account) is None:
+            raise ApiError(400, f"No account named {account!r}")
+        category_id = item.get("category_id")
+        if category_id is None and isinstance(item.get("category"), str):
+            category_id = ledger.categories.id_for(item["category"])
+        if (type(category_id) is not int or category_id not in ledger.categories
+                or ledger.categories.get(category_id)["archived"]):
+            raise ApiError(400, f"No category {item.get('category', category_id)!r}")
+        amount = parse_amount(item.get("amount"))
+        if not 0 < amount <= MAX_CENTAVOS:
+            raise ApiError(400, f"amount must be more than 0 and at most {format_plain(MAX_CENTAVOS)}")
+        when = None
+        if item.get("datetime"):
+            try:
+                when = check_date(datetime.fromisoformat(item["datetime"]))
+            except (TypeError, ValueError):
+                raise ApiError(400, f"Invalid datetime: {item['datetime']!r}, expected "
+                                    f"{MIN_DATE.isoformat()} to {MAX_DATE.isoformat()}")
+        notes = item.get("notes") or ""
+        if not isinstance(notes, str):
+            raise ApiError(400, "notes must be text")
+        return ledger.build_transaction(account, category_id, amount, notes, when)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the budget ledger as a local JSON API.")
+    parser.add_argument("--db", default=DB_PATH, help="ledger database (default: %(default)s)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    args = parser.parse_args(argv)
+
+    ledger = Ledger(LedgerStore(args.db))
+    ledger.load()
+    ledger.post_due_recurring()
+    try:
+        asyncio.run(ApiServer(ledger).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ledger.save_snapshot()
+        ledger.store.close()
+        tracer.write()
+
+
+if __name__ == "__main__":
+    main()
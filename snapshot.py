@@ -0,0 +1,227 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from datetime import date
+
+from aggregates import TotalsIndex
+from columns import TransactionColumns, numpy
+from search import SearchIndex
+from tracing import traced
+
+# A snapshot is one file next to the database:
+#   header   magic, format, ledger version, max transaction id, CRC-32, section count
+#   table    (name, offset, length) per section
+#   sections raw little-endian arrays, plus one JSON section for the small tables
+# The CRC covers everything after the header. It is only trusted when the
+# ledger version and max transaction id still match the database.
+MAGIC = b"BUDGSNAP"
+FORMAT_VERSION = 5
+HEADER = struct.Struct("<8sIQQII")
+SECTION = struct.Struct("<16sQQ")
+NOTE_SEPARATOR = "\x00"
+
+COLUMN_SECTIONS = ("ids", "timestamps", "amounts", "account_ids", "category_ids", "note_ids")
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def snapshot_path(db_path):
+    return db_path + ".snapshot"
+
+
+def write_snapshot(path, ledger_version, max_id, sections):
+    table = b""
+    offset = HEADER.size + SECTION.size * len(sections)
+    for name, data in sections:
+        if len(name.encode()) > 16:
+            raise SnapshotError(f"Section name too long: {name}")
+        table += SECTION.pack(name.encode(), offset, len(data))
+        offset += len(data)
+    crc = zlib.crc32(table)
+    for _, data in sections:
+        crc = zlib.crc32(data, crc)
+
+    # Write aside and rename, so a crash mid-write never leaves a torn snapshot behind.
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, ledger_version, max_id, crc, len(sections)))
+        f.write(table)
+        for _, data in sections:
+            f.write(data)
+    os.replace(temp_path, path)
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.parse()
+        except (SnapshotError, struct.error):
+            self.close()
+            raise
+
+    def parse(self):
+        if len(self.map) < HEADER.size:
+            raise SnapshotError("Snapshot is truncated")
+        magic, fmt, self.ledger_version, self.max_id, crc, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise SnapshotError("Not a snapshot in this format")
+        view = memoryview(self.map)
+        try:
+            if zlib.crc32(view[HEADER.size:]) != crc:
+                raise SnapshotError("Snapshot checksum mismatch")
+        finally:
+            view.release()
+
+        self.sections = {}
+        for i in range(count):
+            name, offset, length = SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size)
+            if offset + length > len(self.map):
+                raise SnapshotError("Snapshot section out of bounds")
+            self.sections[name.rstrip(b"\0").decode()] = (offset, length)
+
+    def raw(self, name):
+        offset, length = self.sections[name]
+        return self.map[offset:offset + length]
+
+    def array(self, name, typecode):
+        values = array(typecode)
+        values.frombytes(self.raw(name))
+        return values
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+"""LEDGER"""
+
+
+def int_array(typecode, values):
+    return array(typecode, values).tobytes()
+
+
+def month_code(month):
+    return month[0] * 12 + month[1] - 1
+
+
+def month_from_code(code):
+    year, month = divmod(code, 12)
+    return year, month + 1
+
+
+@traced("snapshot.save")
+def save_ledger(ledger, path, indexed_version):
+    # indexed_version is the store's ledger_version() the ledger's indexes
+    # were built from; the caller makes sure the database is still there.
+    store = ledger.store
+    ledger_version, max_id = indexed_version
+    totals = ledger.totals
+    columns = ledger.columns
+    search = ledger.search
+    if any(NOTE_SEPARATOR in notes for notes in search.note_ids):
+        raise SnapshotError("Notes contain the section separator")
+
+    # Balances come from the store: the ledger's in-memory copies can run
+    # ahead of what is saved, and the snapshot must match the database.
+    meta = {
+        "accounts": [[row["id"], row["type"], row["name"], row["balance"], row["currency"]]
+                     for row in store.load_accounts()],
+        "categories": list(ledger.categories.values()),
+        "next_note_id": search.next_note_id,
+        "fx_mtime": ledger.fx.mtime,
+    }
+    days = sorted(totals.days)
+    months = sorted(totals.months)
+    counted_months = sorted(totals.month_counts)
+    category_months = list(totals.category_months)
+    notes = list(search.note_ids)
+    sections = [
+        ("meta", json.dumps(meta).encode()),
+        ("notes", NOTE_SEPARATOR.join(notes).encode()),
+        ("note_ids_by_text", int_array("i", (search.note_ids[text] for text in notes))),
+        ("note_counts", int_array("q", (search.note_counts[search.note_ids[text]] for text in notes))),
+        ("day_keys", int_array("i", (day.toordinal() for day in days))),
+        ("day_totals", int_array("q", (totals.days[day] for day in days))),
+        ("month_keys", int_array("i", (month_code(month) for month in months))),
+        ("month_totals", int_array("q", (totals.months[month] for month in months))),
+        ("count_keys", int_array("i", (month_code(month) for month in counted_months))),
+        ("month_counts", int_array("q", (totals.month_counts[month] for month in counted_months))),
+        ("cat_month_ids", int_array("i", (key[0] or 0 for key in category_months))),
+        ("cat_month_keys", int_array("i", (month_code(key[1:]) for key in category_months))),
+        ("cat_month_totals", int_array("q", (totals.category_months[key] for key in category_months))),
+        ("expenses_tree", int_array("q", totals.expenses.tree)),
+        ("income_tree", int_array("q", totals.income.tree)),
+    ]
+    sections += [(name, getattr(columns, name).tobytes()) for name in COLUMN_SECTIONS]
+    if numpy() is not None and len(columns):
+        sections.append(("order", columns.np_order().astype("<i8").tobytes()))
+    write_snapshot(path, ledger_version, max_id, sections)
+
+
+@traced("snapshot.restore")
+def restore_ledger(path, ledger_version):
+    # (meta, totals, columns, search) from the snapshot at path, or None when
+    # there is no usable snapshot for a ledger at ledger_version.
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    with snapshot:
+        if (snapshot.ledger_version, snapshot.max_id) != tuple(ledger_version):
+            return None
+        try:
+            return read_ledger_state(snapshot)
+        except (KeyError, ValueError):
+            return None
+
+
+def read_ledger_state(snapshot):
+    meta = json.loads(snapshot.raw("meta"))
+
+    totals = TotalsIndex()
+    day_keys = snapshot.array("day_keys", "i")
+    totals.days.update(zip(map(date.fromordinal, day_keys), snapshot.array("day_totals", "q")))
+    totals.months.update(zip(map(month_from_code, snapshot.array("month_keys", "i")),
+                             snapshot.array("month_totals", "q")))
+    totals.month_counts.update(zip(map(month_from_code, snapshot.array("count_keys", "i")),
+                                   snapshot.array("month_counts", "q")))
+    category_ids = snapshot.array("cat_month_ids", "i")
+    category_months = map(month_from_code, snapshot.array("cat_month_keys", "i"))
+    totals.category_months.update(zip(((category_id or None,) + month for category_id, month
+                                       in zip(category_ids, category_months)),
+                                      snapshot.array("cat_month_totals", "q")))
+    for name, tree in (("expenses_tree", totals.expenses), ("income_tree", totals.income)):
+        tree.tree = snapshot.array(name, "q").tolist()
+        if not tree.tree:
+            raise ValueError("Empty Fenwick tree")
+
+    columns = TransactionColumns()
+    for name in COLUMN_SECTIONS:
+        setattr(columns, name, snapshot.array(name, getattr(columns, name).typecode))
+    if len({len(getattr(columns, name)) for name in COLUMN_SECTIONS}) != 1:
+        raise ValueError("Column lengths differ")
+    np = numpy()
+    if np is not None and "order" in snapshot.sections:
+        columns.order = np.frombuffer(snapshot.raw("order"), dtype="<i8").astype(np.intp)
+
+    search = SearchIndex(columns)
+    raw_notes = snapshot.raw("notes").decode()
+    note_ids = snapshot.array("note_ids_by_text", "i")
+    notes = raw_notes.split(NOTE_SEPARATOR) if note_ids else []
+    search.restore_notes(dict(zip(notes, note_ids)), dict(zip(note_ids, snapshot.array("note_counts", "q"))),
+                         meta["next_note_id"])
+    return meta, totals, columns, search
+
@@ -0,0 +1,395 @@
+import sqlite3
+
+DB_PATH = "budget.db"
+SCHEMA_VERSION = 9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    balance INTEGER NOT NULL DEFAULT 0,
+    currency TEXT NOT NULL DEFAULT 'PHP'
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    icon TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    archived INTEGER NOT NULL DEFAULT 0,
+    budget INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    account_id INTEGER,
+    category TEXT NOT NULL,
+    category_id INTEGER,
+    amount INTEGER NOT NULL,
+    datetime TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT ''
+);
+
+CREATE INDEX IF NOT EXISTS transactions_account_datetime ON transactions (account, datetime);
+CREATE INDEX IF NOT EXISTS transactions_category_datetime ON transactions (category, datetime);
+CREATE INDEX IF NOT EXISTS transactions_datetime ON transactions (datetime);
+
+CREATE TABLE IF NOT EXISTS ledger_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO ledger_meta (key, value) VALUES ('version', 1);
+
+CREATE TABLE IF NOT EXISTS recurring (
+    id INTEGER PRIMARY KEY,
+    account_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    frequency TEXT NOT NULL,
+    interval INTEGER NOT NULL DEFAULT 1,
+    start TEXT NOT NULL,
+    next_due TEXT NOT NULL
+);
+"""
+
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1. Each step
+# runs in its own transaction together with its user_version bump, so a
+# failed step is retried on the next start and a finished one never reruns.
+MIGRATIONS = {
+    1: """
+    ALTER TABLE accounts RENAME TO accounts_v1;
+    ALTER TABLE transactions RENAME TO transactions_v1;
+    DROP INDEX IF EXISTS transactions_account_datetime;
+    DROP INDEX IF EXISTS transactions_category_datetime;
+    CREATE TABLE accounts (
+        id INTEGER PRIMARY KEY,
+        type TEXT NOT NULL,
+        name TEXT NOT NULL,
+        balance INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY,
+        account TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        datetime TEXT NOT NULL,
+        notes TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX transactions_account_datetime ON transactions (account, datetime);
+    CREATE INDEX transactions_category_datetime ON transactions (category, datetime);
+    INSERT INTO accounts (id, type, name, balance)
+        SELECT id, type, name, CAST(ROUND(balance * 100) AS INTEGER) FROM accounts_v1;
+    INSERT INTO transactions (id, account, category, amount, datetime, notes)
+        SELECT id, account, category, CAST(ROUND(amount * 100) AS INTEGER), datetime, notes FROM transactions_v1;
+    DROP TABLE accounts_v1;
+    DROP TABLE transactions_v1;
+    """,
+    2: """
+    CREATE INDEX IF NOT EXISTS transactions_datetime ON transactions (datetime);
+    """,
+    3: """
+    CREATE TABLE IF NOT EXISTS ledger_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO ledger_meta (key, value) VALUES ('version', 1);
+    """,
+    # Deleted categories are archived rather than removed, and transactions
+    # point at their category by id. History naming a category that was
+    # deleted before this gets an archived row of its own.
+    4: """
+    ALTER TABLE categories RENAME TO categories_v4;
+    CREATE TABLE categories (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        icon TEXT NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0,
+        archived INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO categories (id, kind, name, icon, position)
+        SELECT id, kind, name, icon, position FROM categories_v4;
+    DROP TABLE categories_v4;
+    INSERT INTO categories (kind, name, icon, archived)
+        SELECT CASE WHEN SUM(amount) > 0 THEN 'income' ELSE 'expenses' END, category, 'icons/placeholder.png', 1
+        FROM transactions WHERE category NOT IN (SELECT name FROM categories) GROUP BY category;
+    ALTER TABLE transactions ADD COLUMN category_id INTEGER;
+    UPDATE transactions SET category_id = (
+        SELECT MIN(id) FROM categories WHERE categories.name = transactions.category
+    );
+    """,
+    5: """
+    CREATE TABLE IF NOT EXISTS recurring (
+        id INTEGER PRIMARY KEY,
+        account_id INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        notes TEXT NOT NULL DEFAULT '',
+        frequency TEXT NOT NULL,
+        interval INTEGER NOT NULL DEFAULT 1,
+        start TEXT NOT NULL,
+        next_due TEXT NOT NULL
+    );
+    """,
+    # Monthly spending limit in centavos; NULL for none.
+    6: """
+    ALTER TABLE categories ADD COLUMN budget INTEGER;
+    """,
+    # ISO 4217 code; balances and transactions are in hundredths of it.
+    7: """
+    ALTER TABLE accounts ADD COLUMN currency TEXT NOT NULL DEFAULT 'PHP';
+    """,
+    # Transactions point at their account by id, as they do at categories:
+    # account names need not stay unique. Where names already repeat, the
+    # oldest account gets the history. The version bump retires snapshots
+    # indexed by name.
+    8: """
+    ALTER TABLE transactions ADD COLUMN account_id INTEGER;
+    UPDATE transactions SET account_id = (
+        SELECT MIN(id) FROM accounts WHERE accounts.name = transactions.account
+    );
+    UPDATE ledger_meta SET value = value + 1 WHERE key = 'version';
+    """,
+}
+
+
+class LedgerStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL keeps inserts append-only so commit cost does not grow with the file.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.is_new = version == 0
+        # A new database gets the current schema as is; migrations are only
+        # for files written by older versions.
+        if self.is_new:
+            self.run_script(SCHEMA, SCHEMA_VERSION)
+        else:
+            for step in range(version, SCHEMA_VERSION):
+                self.run_script(MIGRATIONS[step], step + 1)
+
+    def run_script(self, script, user_version):
+        try:
+            self.conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {user_version};\nCOMMIT;")
+        except sqlite3.Error:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    def bump_version(self):
+        # Every write goes through this store and bumps the ledger version
+        # inside its own transaction, so a snapshot can tell it is stale.
+        self.conn.execute("UPDATE ledger_meta SET value = value + 1 WHERE key = 'version'")
+
+    def ledger_version(self):
+        row = self.conn.execute(
+            "SELECT (SELECT value FROM ledger_meta WHERE key = 'version'), "
+            "(SELECT COALESCE(MAX(id), 0) FROM transactions)"
+        ).fetchone()
+        return row[0], row[1]
+
+    """ACCOUNTS"""
+
+    def load_accounts(self):
+        return self.conn.execute("SELECT id, type, name, balance, currency FROM accounts ORDER BY id").fetchall()
+
+    def add_account(self, account_type, name, balance, currency="PHP"):
+        with self.conn:
+            self.bump_version()
+            cursor = self.conn.execute(
+                "INSERT INTO accounts (type, name, balance, currency) VALUES (?, ?, ?, ?)",
+                (account_type, name, balance, currency)
+            )
+        return cursor.lastrowid
+
+    def delete_account(self, account_id):
+        with self.conn:
+            self.bump_version()
+            self.conn.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+
+    """CATEGORIES"""
+
+    def load_categories(self):
+        # Archived categories are included: old transactions still refer to them.
+        return self.conn.execute(
+            "SELECT id, kind, name, icon, archived, budget FROM categories ORDER BY kind, position, id"
+        ).fetchall()
+
+    def add_category(self, kind, name, icon):
+        with self.conn:
+            self.bump_version()
+            position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM categories WHERE kind = ?", (kind,)
+            ).fetchone()[0]
+            cursor = self.conn.execute(
+                "INSERT INTO categories (kind, name, icon, position) VALUES (?, ?, ?, ?)",
+                (kind, name, icon, position)
+            )
+        return cursor.lastrowid
+
+    def add_categories(self, categories):
+        with self.conn:
+            self.bump_version()
+            for kind, section in categories.items():
+                for position, category in enumerate(section):
+                    cursor = self.conn.execute(
+                        "INSERT INTO categories (kind, name, icon, position) VALUES (?, ?, ?, ?)",
+                        (kind, category["name"], category["icon"], position)
+                    )
+                    category["id"] = cursor.lastrowid
+
+    def delete_categories(self, category_ids):
+        with self.conn:
+            self.bump_version()
+            self.conn.executemany("UPDATE categories SET archived = 1 WHERE id = ?", [(cid,) for cid in category_ids])
+
+    def set_category_budget(self, category_id, budget):
+        with self.conn:
+            self.bump_version()
+            self.conn.execute("UPDATE categories SET budget = ? WHERE id = ?", (budget, category_id))
+
+    """TRANSACTIONS"""
+
+    def load_transactions(self):
+        return self.conn.execute(
+            "SELECT id, account, account_id, category, category_id, amount, datetime, notes FROM transactions "
+            "ORDER BY datetime, id"
+        ).fetchall()
+
+    def iter_transactions(self, start=None, end=None, account=None, category=None, batch_size=1000):
+        # start and end are inclusive YYYY-MM-DD dates. Rows are fetched in
+        # batches, so callers can stream any range without holding it in memory.
+        clauses = []
+        params = []
+        if account is not None:
+            clauses.append("account = ?")
+            params.append(account)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if start is not None:
+            clauses.append("datetime >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("datetime <= ?")
+            params.append(end + " 23:59:59")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            "SELECT id, account, account_id, category, category_id, amount, datetime, notes FROM transactions "
+            f"{where} ORDER BY datetime, id",
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def transactions_by_ids(self, ids):
+        # Rows in the order of ids; ids that no longer exist are skipped.
+        ids = list(ids)
+        rows = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for row in self.conn.execute(
+                "SELECT id, account, account_id, category, category_id, amount, datetime, notes FROM transactions "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            ):
+                rows[row["id"]] = row
+        return [rows[transaction_id] for transaction_id in ids if transaction_id in rows]
+
+    def add_transaction(self, account_id, account, category_id, category, amount, transaction_time, notes):
+        # The transaction row and the balance it moves are committed together.
+        with self.conn:
+            self.bump_version()
+            cursor = self.conn.execute(
+                "INSERT INTO transactions (account_id, account, category_id, category, amount, datetime, notes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account_id, account, category_id, category, amount, transaction_time, notes)
+            )
+            self.conn.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (amount, account_id))
+        return cursor.lastrowid
+
+    def delete_transaction(self, transaction_id, account_id, amount):
+        with self.conn:
+            self.bump_version()
+            self.conn.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+            self.conn.execute("UPDATE accounts SET balance = balance - ? WHERE id = ?", (amount, account_id))
+
+    def add_transactions(self, rows, balance_deltas):
+        # rows are (account_id, account, category_id, category, amount,
+        # datetime, notes) tuples; balance_deltas maps account id to the batch's net amount.
+        with self.conn:
+            self.insert_transactions(rows, balance_deltas)
+
+    def post_transactions(self, rows, balance_deltas):
+        # add_transactions that also returns the inserted rows in the order given.
+        with self.conn:
+            first_id = self.insert_transactions(rows, balance_deltas)
+            return self.transactions_from(first_id)
+
+    """RECURRING"""
+
+    def load_recurring(self):
+        return self.conn.execute(
+            "SELECT id, account_id, category_id, amount, notes, frequency, interval, start, next_due "
+            "FROM recurring ORDER BY id"
+        ).fetchall()
+
+    def add_recurring(self, account_id, category_id, amount, notes, frequency, interval, start, next_due):
+        with self.conn:
+            self.bump_version()
+            cursor = self.conn.execute(
+                "INSERT INTO recurring (account_id, category_id, amount, notes, frequency, interval, start, next_due) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account_id, category_id, amount, notes, frequency, interval, start, next_due)
+            )
+        return cursor.lastrowid
+
+    def delete_recurring(self, rule_id):
+        with self.conn:
+            self.bump_version()
+            self.conn.execute("DELETE FROM recurring WHERE id = ?", (rule_id,))
+
+    def post_recurring(self, rows, balance_deltas, next_due):
+        # A whole catch-up in one commit: the generated transactions (rows as
+        # for add_transactions), the balances they move and the rules' new due
+        # times. Returns the inserted rows in the order given.
+        with self.conn:
+            first_id = self.insert_transactions(rows, balance_deltas)
+            self.conn.executemany(
+                "UPDATE recurring SET next_due = ? WHERE id = ?", [(due, rule_id) for rule_id, due in next_due.items()]
+            )
+            return self.transactions_from(first_id)
+
+    def insert_transactions(self, rows, balance_deltas):
+        # The body of add_transactions; callers hold the transaction. Returns
+        # the id of the first inserted row.
+        self.bump_version()
+        first_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transactions").fetchone()[0]
+        self.conn.executemany(
+            "INSERT INTO transactions (account_id, account, category_id, category, amount, datetime, notes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self.conn.executemany(
+            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
+            [(delta, account_id) for account_id, delta in balance_deltas.items()]
+        )
+        return first_id
+
+    def transactions_from(self, first_id):
+        # Read inside the inserting transaction, so no other writer's rows mix in.
+        return self.conn.execute(
+            "SELECT id, account, account_id, category, category_id, amount, datetime, notes FROM transactions "
+            "WHERE id >= ? ORDER BY id", (first_id,)
+        ).fetchall()
@@ -0,0 +1,186 @@
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+
+# Opt-in timing for the hot paths. Set BUDGET_TRACE=1 to print a summary to
+# stderr on exit, or BUDGET_TRACE=<file>.json to write the histograms there.
+# While disabled, timer() hands back one shared no-op context manager and
+# traced() functions cost a single attribute check per call.
+TRACE_ENV = "BUDGET_TRACE"
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+SLOW_MS = 50
+HEARTBEAT_MS = 50
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of samples.
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (self.max,), self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": {f"<={bound}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}": count
+                        for i, (bound, count) in enumerate(zip(BUCKETS_MS + (None,), self.counts)) if count},
+        }
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=False, output=None):
+        self.enabled = enabled
+        self.output = output
+        self.histograms = {}
+        # Sections that finished since the last heartbeat, so a stall can be
+        # pinned on the handlers that ran during it.
+        self.recent = deque(maxlen=64)
+        self.slow = deque(maxlen=200)
+
+    def enable(self, output=None):
+        self.enabled = True
+        self.output = output
+
+    def timer(self, name):
+        return Timer(self, name) if self.enabled else NULL_TIMER
+
+    def record(self, name, ms):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(ms)
+        self.recent.append((name, ms))
+        if ms >= SLOW_MS:
+            self.slow.append({"name": name, "ms": round(ms, 3), "at": time.time()})
+
+    def reset(self):
+        self.histograms.clear()
+        self.recent.clear()
+        self.slow.clear()
+
+    def dump(self):
+        return {
+            "timers": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            "slow": list(self.slow),
+        }
+
+    def report(self):
+        lines = [f"{'timer':<32}{'count':>8}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            summary = histogram.summary()
+            lines.append(f"{name:<32}{summary['count']:>8}{summary['mean_ms']:>10.2f}"
+                         f"{summary['p95_ms']:>10.2f}{summary['max_ms']:>10.2f}")
+        for event in self.slow:
+            lines.append(f"slow: {event['name']} {event['ms']:.1f} ms" +
+                         (f" during {', '.join(event['during'])}" if event.get("during") else ""))
+        return "\n".join(lines)
+
+    def write(self):
+        if not self.enabled:
+            return
+        if self.output and self.output != "1":
+            with open(self.output, "w", encoding="utf-8") as out:
+                json.dump(self.dump(), out, indent=2)
+        else:
+            print(self.report(), file=sys.stderr)
+
+
+class Heartbeat:
+    # Re-arms root.after(interval) and records how late each tick fires. A
+    # late tick means the main loop was busy in a handler for that long.
+    def __init__(self, root, tracer, interval_ms=HEARTBEAT_MS):
+        self.root = root
+        self.tracer = tracer
+        self.interval_ms = interval_ms
+        self.after_id = None
+        self.expected = None
+
+    def start(self):
+        self.tracer.recent.clear()
+        self.expected = time.perf_counter() + self.interval_ms / 1000
+        self.after_id = self.root.after(self.interval_ms, self.beat)
+
+    def beat(self):
+        stall = max(0.0, (time.perf_counter() - self.expected) * 1000)
+        during = sorted(self.tracer.recent, key=lambda item: -item[1])[:3]
+        self.tracer.record("mainloop.stall", stall)
+        if stall >= SLOW_MS:
+            self.tracer.slow[-1]["during"] = [f"{name} ({ms:.1f} ms)" for name, ms in during]
+        self.start()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+
+tracer = Tracer()
+if os.environ.get(TRACE_ENV):
+    tracer.enable(os.environ[TRACE_ENV])
+
+
+def timer(name):
+    return tracer.timer(name)
+
+
+def traced(name):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with Timer(tracer, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,218 @@
+from tkinter import ttk
+
+from money import format_amount
+from tracing import traced
+
+ROW_HEIGHT = 60
+# How close (in rows) the viewport may get to either end before on_edge fires.
+EDGE_ROWS = 10
+
+
+def row_key(row):
+    # "2024-05~" sorts above every day of May 2024, "2024-05-31 ~" above
+    # every transaction of that day.
+    if row[0] == "month":
+        return row[1] + "~"
+    if row[0] == "header":
+        return row[1] + " ~"
+    return row[2]["datetime"]
+
+
+class TransactionListView(ttk.Frame):
+    # Only the rows inside the viewport get widgets. Those widgets are
+    # re-pointed at new rows as the list scrolls, so the widget count depends
+    # on the window height, not on how many transactions exist.
+    def __init__(self, master, icon_for, on_edge=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.icon_for = icon_for
+        # on_edge("start" or "end") lets the owner page more rows in.
+        self.on_edge = on_edge
+        self.edge_after = None
+        self.rows = []
+        self.headers = {}
+        self.top = 0
+        self.header_pool = []
+        self.transaction_pool = []
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.body = ttk.Frame(self)
+        self.body.pack(side="left", expand=True, fill="both")
+        self.body.bind("<Configure>", lambda event: self.render())
+        self.bind_scroll(self.body)
+
+        self.empty_label = ttk.Label(self.body, text="No transactions available", font=("Arial", 12))
+        self.sticky_header = self.make_header_row()
+
+    def bind_scroll(self, widget):
+        widget.bind("<MouseWheel>", self.on_mousewheel)
+        widget.bind("<Button-4>", lambda event: self.scroll_by(-ROW_HEIGHT))
+        widget.bind("<Button-5>", lambda event: self.scroll_by(ROW_HEIGHT))
+
+    def make_header_row(self):
+        header = ttk.Frame(self.body)
+        header.label = ttk.Label(header, font=("Arial", 10, "bold"), anchor="center")
+        header.label.pack(fill="x", pady=(10, 5))
+        ttk.Separator(header, orient="horizontal").pack(fill="x", side="bottom", pady=5)
+        self.bind_scroll(header)
+        self.bind_scroll(header.label)
+        return header
+
+    def make_transaction_row(self):
+        row = ttk.Frame(self.body)
+        ttk.Separator(row, orient="horizontal").pack(fill="x", side="bottom", pady=5)
+        row.icon_label = ttk.Label(row)
+        row.icon_label.pack(side="left", padx=5)
+        row.details_label = ttk.Label(row, font=("Arial", 10))
+        row.details_label.pack(side="left", padx=5, fill="x", expand=True)
+        row.amount_label = ttk.Label(row, font=("Arial", 10, "bold"))
+        row.amount_label.pack(side="right", padx=5)
+        for widget in (row, row.icon_label, row.details_label, row.amount_label):
+            self.bind_scroll(widget)
+        return row
+
+    def set_rows(self, rows, headers):
+        # rows holds ("header", date_str) and ("transaction", date_str, transaction)
+        # tuples in display order; headers maps date_str to its header text.
+        self.rows = rows
+        self.headers = headers
+        self.render()
+
+    def append_rows(self, rows, headers):
+        # Continues the current rows, e.g. while search results stream in.
+        self.rows.extend(rows)
+        self.headers.update(headers)
+        self.render()
+
+    def prepend_rows(self, rows, headers):
+        self.rows[:0] = rows
+        self.headers.update(headers)
+        self.top += len(rows) * ROW_HEIGHT
+        self.render()
+
+    def drop_rows(self, count, from_start):
+        if from_start:
+            dropped, self.rows = self.rows[:count], self.rows[count:]
+            self.top = max(0, self.top - count * ROW_HEIGHT)
+        else:
+            dropped, self.rows = self.rows[len(self.rows) - count:], self.rows[:len(self.rows) - count]
+        for row in dropped:
+            if row[0] != "transaction":
+                self.headers.pop(row[1], None)
+        self.render()
+
+    def visible_range(self):
+        first = self.top // ROW_HEIGHT
+        return first, first + self.body.winfo_height() // ROW_HEIGHT + 1
+
+    def find_row(self, key):
+        # rows are in descending key order; return the first index whose key is <= key.
+        lo, hi = 0, len(self.rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if row_key(self.rows[mid]) > key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def insert_row(self, row):
+        index = self.find_row(row_key(row))
+        self.rows.insert(index, row)
+        # Keep the viewport on the same rows when something lands above it.
+        if index < self.top // ROW_HEIGHT:
+            self.top += ROW_HEIGHT
+
+    def insert_transaction(self, date_str, trans, header_text):
+        if date_str not in self.headers:
+            self.insert_row(("header", date_str))
+        self.headers[date_str] = header_text
+        self.insert_row(("transaction", date_str, trans))
+        self.render()
+
+    def total_height(self):
+        return len(self.rows) * ROW_HEIGHT
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, self.total_height() - self.body.winfo_height()))
+        self.render()
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.top + delta)
+
+    def on_mousewheel(self, event):
+        steps = -1 if event.delta > 0 else 1
+        self.scroll_by(steps * ROW_HEIGHT)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total_height()))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self.body.winfo_height())
+        else:
+            self.scroll_by(int(amount) * ROW_HEIGHT)
+
+    @traced("list.render")
+    def render(self):
+        height = self.body.winfo_height()
+        total = self.total_height()
+        self.top = max(0, min(self.top, total - height))
+
+        if not self.rows:
+            for widget in self.header_pool + self.transaction_pool + [self.sticky_header]:
+                widget.place_forget()
+            self.empty_label.pack(pady=20)
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.pack_forget()
+
+        first, offset = divmod(self.top, ROW_HEIGHT)
+        visible = self.rows[first:first + height // ROW_HEIGHT + 2]
+        headers_used = 0
+        transactions_used = 0
+        for i, row in enumerate(visible):
+            if row[0] != "transaction":
+                if headers_used == len(self.header_pool):
+                    self.header_pool.append(self.make_header_row())
+                widget = self.header_pool[headers_used]
+                headers_used += 1
+                widget.label.config(text=self.headers[row[1]])
+            else:
+                if transactions_used == len(self.transaction_pool):
+                    self.transaction_pool.append(self.make_transaction_row())
+                widget = self.transaction_pool[transactions_used]
+                transactions_used += 1
+                self.configure_transaction_row(widget, row[2])
+            widget.place(x=0, y=i * ROW_HEIGHT - offset, relwidth=1, height=ROW_HEIGHT)
+
+        for widget in self.header_pool[headers_used:] + self.transaction_pool[transactions_used:]:
+            widget.place_forget()
+
+        self.sticky_header.label.config(text=self.headers[self.rows[first][1]])
+        self.sticky_header.place(x=0, y=0, relwidth=1, height=ROW_HEIGHT)
+        self.sticky_header.lift()
+
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + height) / total))
+
+        if self.on_edge is not None and self.edge_after is None:
+            if first + len(visible) + EDGE_ROWS >= len(self.rows):
+                self.edge_after = self.after_idle(self.fire_edge, "end")
+            elif first <= EDGE_ROWS:
+                self.edge_after = self.after_idle(self.fire_edge, "start")
+
+    def fire_edge(self, edge):
+        self.edge_after = None
+        self.on_edge(edge)
+
+    def configure_transaction_row(self, widget, trans):
+        icon_photo = self.icon_for(trans)
+        if icon_photo:
+            widget.icon_label.config(image=icon_photo, text="")
+        else:
+            widget.icon_label.config(image="", text="[icon]")
+
+        details = f"{trans['category']} \n{trans['account']}"
+        if trans["notes"]:
+            details += f"\n{trans['notes']}"
+        widget.details_label.config(text=details)
+        widget.amount_label.config(text=format_amount(trans["amount"], trans["currency"]))
@@ -0,0 +1,80 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 15
+
+
+class JobGroup:
+    # The jobs started for one screen or modal. Cancelling the group skips
+    # jobs that have not started and drops the results of the ones that
+    # have, so callbacks never touch widgets that are already gone.
+    def __init__(self, pool):
+        self.pool = pool
+        self.futures = set()
+        self.cancelled = False
+
+    def submit(self, func, *args, callback=None, on_error=None):
+        return self.pool.submit(func, *args, callback=callback, on_error=on_error, group=self)
+
+    def cancel(self):
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+        self.futures.clear()
+
+
+class WorkerPool:
+    # Runs blocking work (image decoding, file and disk I/O) on a few
+    # threads. Workers never touch Tk: finished futures are queued and the
+    # main loop drains them with root.after while anything is outstanding,
+    # calling each callback on the Tk thread.
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="budget-worker")
+        self.results = queue.Queue()
+        self.pending = 0
+        self.after_id = None
+
+    def group(self):
+        return JobGroup(self)
+
+    def submit(self, func, *args, callback=None, on_error=None, group=None):
+        future = self.executor.submit(func, *args)
+        self.pending += 1
+        if group is not None:
+            group.futures.add(future)
+        future.add_done_callback(lambda done: self.results.put((done, callback, on_error, group)))
+        if self.after_id is None:
+            self.after_id = self.root.after(POLL_MS, self.drain)
+        return future
+
+    def drain(self):
+        self.after_id = None
+        while True:
+            try:
+                future, callback, on_error, group = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if group is not None:
+                if group.cancelled:
+                    continue
+                group.futures.discard(future)
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                if on_error is not None:
+                    on_error(error)
+            elif callback is not None:
+                callback(future.result())
+
+        if self.pending:
+            self.after_id = self.root.after(POLL_MS, self.drain)
+
+    def shutdown(self, wait=False):
+        # wait=True also joins the threads, for callers that keep running after the root is gone.
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.executor.shutdown(wait=wait, cancel_futures=True)